@@ -5,13 +5,20 @@ from .models import User, TrustBadge, Notification
 
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
-    list_display = ['email', 'username', 'first_name', 'last_name', 'trust_score', 'total_swaps', 'is_verified', 'is_active']
+    list_display = [
+        'email', 'username', 'first_name', 'last_name', 'trust_score', 'rating_count', 'total_swaps',
+        'is_verified', 'is_active'
+    ]
     list_filter = ['is_verified', 'is_active', 'is_staff']
     search_fields = ['email', 'username', 'first_name', 'last_name']
     ordering = ['-created_at']
+    readonly_fields = ['trust_score', 'rating_sum', 'rating_count']
     
     fieldsets = BaseUserAdmin.fieldsets + (
-        ('Additional Info', {'fields': ('avatar', 'bio', 'location', 'latitude', 'longitude', 'trust_score', 'total_swaps', 'is_verified')}),
+        ('Additional Info', {'fields': (
+            'avatar', 'bio', 'location', 'latitude', 'longitude', 'trust_score', 'rating_sum', 'rating_count',
+            'total_swaps', 'is_verified'
+        )}),
     )
 
 
@@ -0,0 +1,109 @@
+"""
+Declarative trust badge rules.
+
+A rule awards a badge once a per-user metric reaches a threshold. Code that
+changes a metric records the event that changed it (record_event); a task
+queue job then evaluates only the rules reading metrics that event touches,
+for the users involved, once the transaction commits. Each evaluation reads
+each metric and the users' existing badges with one query apiece and awards
+badges in bulk.
+"""
+import uuid
+from collections import namedtuple
+
+from django.db import transaction
+from django.db.models import Count
+
+from jobs.queue import enqueue, task
+from .models import TrustBadge, User
+from .notifications import batch, notify
+
+BadgeRule = namedtuple('BadgeRule', ['badge_type', 'name', 'metric', 'threshold'])
+
+RULES = [
+    BadgeRule('quick_swapper', 'Quick Swapper', 'total_swaps', 1),
+    BadgeRule('trusted', 'Trusted', 'total_swaps', 5),
+    BadgeRule('top_trader', 'Top Trader', 'total_swaps', 10),
+    BadgeRule('reviewer', 'Reviewer', 'reviews_received', 10),
+]
+
+# Events that can change each metric
+METRIC_EVENTS = {
+    'total_swaps': {'swap_completed'},
+    'reviews_received': {'review_created'},
+}
+
+
+def total_swaps(user_ids):
+    return dict(User.objects.filter(pk__in=user_ids).values_list('id', 'total_swaps'))
+
+
+def reviews_received(user_ids):
+    from reviews.models import Review
+    return dict(
+        Review.objects.filter(reviewed_user_id__in=user_ids)
+        .values_list('reviewed_user_id').annotate(count=Count('id')).order_by()
+    )
+
+
+METRICS = {
+    'total_swaps': total_swaps,
+    'reviews_received': reviews_received,
+}
+
+
+def rules_for(event=None):
+    """Rules whose metric `event` can change, or every rule when event is None"""
+    if event is None:
+        return list(RULES)
+    return [rule for rule in RULES if event in METRIC_EVENTS[rule.metric]]
+
+
+def evaluate(user_ids, event=None, send_notifications=True):
+    """Award every badge the users now qualify for; returns the (user_id, rule) pairs awarded"""
+    rules = rules_for(event)
+    user_ids = list(user_ids)
+    if not rules or not user_ids:
+        return []
+
+    metrics = {metric: METRICS[metric](user_ids) for metric in {rule.metric for rule in rules}}
+    existing = set(TrustBadge.objects.filter(
+        user_id__in=user_ids, badge_type__in={rule.badge_type for rule in rules}
+    ).values_list('user_id', 'badge_type'))
+
+    awarded = []
+    for user_id in user_ids:
+        for rule in rules:
+            if (user_id, rule.badge_type) in existing:
+                continue
+            if metrics[rule.metric].get(user_id, 0) >= rule.threshold:
+                existing.add((user_id, rule.badge_type))
+                awarded.append((user_id, rule))
+    if not awarded:
+        return []
+
+    with batch(), transaction.atomic():
+        TrustBadge.objects.bulk_create(
+            [TrustBadge(user_id=user_id, badge_type=rule.badge_type) for user_id, rule in awarded],
+            ignore_conflicts=True
+        )
+        if send_notifications:
+            for user_id, rule in awarded:
+                notify(
+                    user_id, 'badge', 'Badge Earned!', f'You earned the {rule.name} badge!',
+                    key=f'badge:{rule.badge_type}'
+                )
+    return awarded
+
+
+@task
+def evaluate_event(user_ids, event):
+    evaluate([uuid.UUID(user_id) for user_id in user_ids], event)
+
+
+def record_event(event, user_ids, key=None):
+    """
+    Evaluate the rules `event` affects for these users once the transaction
+    commits; `key` identifies the occurrence so it is evaluated only once
+    """
+    enqueue(evaluate_event, [str(user_id) for user_id in user_ids], event, key=key)
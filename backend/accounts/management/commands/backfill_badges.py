@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from accounts.badges import evaluate
+from accounts.models import User
+
+
+class Command(BaseCommand):
+    help = 'Evaluate every badge rule for all users and award any badges they are missing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Users evaluated per batch')
+        parser.add_argument('--notify', action='store_true',
+                            help='Send a notification for each badge awarded')
+
+    def handle(self, *args, **options):
+        user_ids = list(User.objects.order_by('id').values_list('id', flat=True))
+        awarded = 0
+        for start in range(0, len(user_ids), options['batch_size']):
+            batch_ids = user_ids[start:start + options['batch_size']]
+            awarded += len(evaluate(batch_ids, send_notifications=options['notify']))
+            self.stdout.write(f'{min(start + len(batch_ids), len(user_ids))}/{len(user_ids)} users, {awarded} badges')
+        self.stdout.write(self.style.SUCCESS(f'Awarded {awarded} badges'))
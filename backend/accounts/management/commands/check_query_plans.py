@@ -0,0 +1,123 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from backend.pagination import CreatedAtCursorPagination
+from bids.views import BiddingViewSet
+from messaging.models import Message
+from products.models import Product
+from products.views import ProductViewSet
+from reviews.views import ReviewViewSet
+from swaps.models import SwapRequest
+from swaps.views import SwapRequestViewSet
+
+User = get_user_model()
+
+POSTGRES_SEQ_SCAN = re.compile(r'Seq Scan on (\w+)')
+SQLITE_SCAN = re.compile(r'\bSCAN (\w+)(.*)$')
+
+
+def view_queryset(viewset_class, user, path='/', **kwargs):
+    """The queryset a list request to the viewset would start from"""
+    request = Request(APIRequestFactory().get(path))
+    request.user = user
+    view = viewset_class(request=request, action='list', kwargs=kwargs, format_kwarg=None)
+    return view.get_queryset()
+
+
+def first_page(queryset, size=12):
+    return queryset.order_by(*CreatedAtCursorPagination.ordering)[:size]
+
+
+def sequential_scans(plan):
+    """Tables the plan reads in full, without an index"""
+    tables = set()
+    for line in plan.splitlines():
+        if connection.vendor == 'postgresql':
+            tables.update(POSTGRES_SEQ_SCAN.findall(line))
+        else:
+            match = SQLITE_SCAN.search(line)
+            if match and 'USING' not in match.group(2) and 'VIRTUAL TABLE' not in match.group(2):
+                tables.add(match.group(1))
+    return tables
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN the main query behind each list endpoint and fail if any of them "
+        "scans a large table sequentially"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', default=None,
+                            help='Email of the user to build the queries for (default: the one with most products)')
+        parser.add_argument('--min-rows', type=int, default=1000,
+                            help='Tables with fewer rows may be scanned sequentially')
+        parser.add_argument('--verbose-plans', action='store_true',
+                            help='Print every plan, not just the failing ones')
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        failures = []
+        row_counts = {}
+        for name, queryset in self.main_queries(user).items():
+            plan = queryset.explain()
+            large = [
+                table for table in sorted(sequential_scans(plan))
+                if self.row_count(table, row_counts) >= options['min_rows']
+            ]
+            if large:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f"{name}: sequential scan of {', '.join(large)}"))
+                self.stdout.write(plan)
+            else:
+                self.stdout.write(f'{name}: ok')
+                if options['verbose_plans']:
+                    self.stdout.write(plan)
+
+        if failures:
+            raise CommandError(f'{len(failures)} queries scan large tables sequentially')
+        self.stdout.write(self.style.SUCCESS('No sequential scans of large tables'))
+
+    def get_user(self, email):
+        if email:
+            try:
+                return User.objects.get(email=email)
+            except User.DoesNotExist:
+                raise CommandError(f'No user with email {email}')
+        user = User.objects.annotate(product_count=Count('products')).order_by('-product_count', 'email').first()
+        if user is None:
+            raise CommandError('The database has no users to build queries for')
+        return user
+
+    def row_count(self, table, cache):
+        if table not in cache:
+            with connection.cursor() as cursor:
+                cursor.execute(f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}')
+                cache[table] = cursor.fetchone()[0]
+        return cache[table]
+
+    def main_queries(self, user):
+        queries = {
+            'products': first_page(view_queryset(ProductViewSet, user)),
+            'available products': first_page(view_queryset(ProductViewSet, user, '/?available=true')),
+            'my products': Product.objects.filter(owner=user, is_active=True),
+            'swaps': first_page(view_queryset(SwapRequestViewSet, user)),
+            'completed swaps': SwapRequest.objects.filter(sender=user, status='completed'),
+            'bids': first_page(view_queryset(BiddingViewSet, user)),
+            'user reviews': first_page(view_queryset(ReviewViewSet, user, user_pk=user.id)),
+            'notifications': first_page(user.notifications.all()),
+            'unread notifications': user.notifications.filter(is_read=False),
+            'unread messages': Message.objects.filter(
+                conversation__participants=user, is_read=False
+            ).exclude(sender=user),
+        }
+        conversation = user.conversations.first()
+        if conversation is not None:
+            queries['conversation messages'] = conversation.messages.all()
+        return queries
@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from accounts.models import User
+from accounts.trust import trust_score, trust_score_expression
+from jobs.queue import enqueue
+from matching.signals import owner_changed
+from matching.snapshot import bump_version
+from reviews.models import Review
+
+
+class Command(BaseCommand):
+    help = "Rebuild every user's review aggregates from the reviews table and recompute trust scores"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report users whose aggregates or trust score have drifted')
+
+    def handle(self, *args, **options):
+        users = User.objects.annotate(
+            actual_sum=Coalesce(Sum('received_reviews__rating'), 0),
+            actual_count=Count('received_reviews'),
+        )
+        drifted = 0
+        corrected = []
+        for user in users.iterator():
+            expected = trust_score(user.actual_sum, user.actual_count, user.total_swaps)
+            if user.trust_score != expected:
+                corrected.append(user.id)
+            if (user.rating_sum, user.rating_count, user.trust_score) != (user.actual_sum, user.actual_count, expected):
+                drifted += 1
+                self.stdout.write(
+                    f'{user.email}: {user.rating_sum}/{user.rating_count} -> {user.actual_sum}/{user.actual_count}, '
+                    f'trust {user.trust_score} -> {expected}'
+                )
+
+        if options['dry_run']:
+            self.stdout.write(f'{drifted} users drifted')
+            return
+
+        # One UPDATE with correlated aggregates, so concurrent F() increments are not lost
+        received = Review.objects.filter(reviewed_user=OuterRef('pk')).order_by().values('reviewed_user')
+        rating_sum = Coalesce(
+            Subquery(received.annotate(total=Sum('rating')).values('total'), output_field=IntegerField()), 0
+        )
+        rating_count = Coalesce(
+            Subquery(received.annotate(total=Count('id')).values('total'), output_field=IntegerField()), 0
+        )
+        with transaction.atomic():
+            updated = User.objects.update(
+                rating_sum=rating_sum,
+                rating_count=rating_count,
+                trust_score=trust_score_expression(rating_sum=rating_sum, rating_count=rating_count),
+            )
+            # Queryset updates send no signals, so matching is refreshed explicitly, as record_review does
+            for user_id in corrected:
+                enqueue(owner_changed, str(user_id))
+
+        if corrected:
+            # One full snapshot rebuild rather than recording every owner
+            bump_version()
+            self.stdout.write(self.style.WARNING(
+                f'{len(corrected)} trust scores changed; queued a match refresh for each of their users'
+            ))
+        self.stdout.write(self.style.SUCCESS(f'Recomputed {updated} users'))
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.30 on 2026-10-17 15:31
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_review_aggregates(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    Review = apps.get_model('reviews', 'Review')
+    aggregates = {
+        user_id: (rating_sum, rating_count)
+        for user_id, rating_sum, rating_count in Review.objects.values_list('reviewed_user_id').annotate(
+            Sum('rating'), Count('id')
+        ).order_by()
+    }
+    users = list(User.objects.only('id', 'total_swaps'))
+    for user in users:
+        # The trust formula as of this migration (accounts.trust)
+        user.rating_sum, user.rating_count = aggregates.get(user.id, (0, 0))
+        review_score = Decimal(user.rating_sum) / user.rating_count if user.rating_count else Decimal('5.00')
+        score = review_score + Decimal('0.25') * user.total_swaps
+        user.trust_score = min(Decimal('9.99'), max(Decimal('0.00'), score)).quantize(
+            Decimal('0.01'), ROUND_HALF_UP
+        )
+    User.objects.bulk_update(users, ['rating_sum', 'rating_count', 'trust_score'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_filter_indexes'),
+        ('reviews', '0002_created_cursor_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='rating_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='rating_sum',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_review_aggregates, migrations.RunPython.noop),
+    ]
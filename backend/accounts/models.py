@@ -13,6 +13,9 @@ class User(AbstractUser):
     longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     trust_score = models.DecimalField(max_digits=3, decimal_places=2, default=5.00)
     total_swaps = models.IntegerField(default=0)
+    # Running aggregates of received review ratings; see accounts.trust
+    rating_sum = models.IntegerField(default=0, editable=False)
+    rating_count = models.IntegerField(default=0, editable=False)
     is_verified = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -60,11 +63,22 @@ class Notification(models.Model):
     type = models.CharField(max_length=20, choices=NOTIFICATION_TYPES)
     title = models.CharField(max_length=255)
     message = models.TextField()
+    # Identity of the event notified about, e.g. 'bid_created:<bid id>'; see accounts.notifications
+    event_key = models.CharField(max_length=100, blank=True, null=True)
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='notification_user_created_idx'),
+            models.Index(fields=['user', 'event_key'], name='notification_event_idx'),
+            models.Index(
+                fields=['user', '-created_at'],
+                condition=models.Q(is_read=False),
+                name='notification_unread_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.user.email}"
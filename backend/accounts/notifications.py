@@ -0,0 +1,153 @@
+"""
+Notification service.
+
+notify() never writes in the caller's request: a notification is kept
+until the caller's transaction commits (and dropped if it rolls back), then
+collected and handed to the task queue (jobs.queue) as one
+deliver_notifications job, which writes them with a single bulk_create and
+publishes them to the messaging event stream. Notifications committed
+inside `with batch():` share one job; NotificationBatchMiddleware makes each
+request a batch. Outside a batch each notification gets its own job.
+
+Callers pass the identity of the event they notify about as `key` (its
+kind and the related object, e.g. f'bid_created:{bid.pk}'). Notifications
+of the same event for the same user are coalesced within a batch, and
+against unread notifications created in the last
+NOTIFICATIONS['COALESCE_WINDOW'] seconds. Notifications without a key are
+never coalesced: two events can read the same and still be different.
+
+Configured with NOTIFICATIONS in settings:
+    'COALESCE_WINDOW': seconds within which an unread notification of the
+                       same event is not repeated (0 disables)
+"""
+import contextvars
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from jobs.queue import enqueue, task
+from .models import Notification
+
+_current_batch = contextvars.ContextVar('notification_batch', default=None)
+
+
+def _config():
+    return getattr(settings, 'NOTIFICATIONS', {})
+
+
+class NotificationBatch:
+    def __init__(self):
+        self.notifications = {}
+
+    def add(self, user, type, title, message, key=None):
+        user_id = str(getattr(user, 'pk', user))
+        # Keyless notifications are all kept
+        identity = (user_id, key) if key is not None else len(self.notifications)
+        if identity not in self.notifications:
+            self.notifications[identity] = {
+                'user_id': user_id, 'type': type, 'title': title, 'message': message, 'event_key': key
+            }
+
+    def flush(self):
+        if not self.notifications:
+            return
+        enqueue(deliver_notifications, list(self.notifications.values()))
+        self.notifications = {}
+
+
+def _recent_duplicates(notifications, window):
+    """(user id, event key) of unread notifications of the same events created within `window` seconds"""
+    keyed = [notification for notification in notifications if notification.event_key is not None]
+    if not keyed:
+        return set()
+    since = timezone.now() - timedelta(seconds=window)
+    match = Q()
+    for notification in keyed:
+        match |= Q(user_id=notification.user_id, event_key=notification.event_key)
+    return {
+        (str(user_id), event_key)
+        for user_id, event_key in Notification.objects.filter(
+            match, is_read=False, created_at__gte=since
+        ).values_list('user_id', 'event_key')
+    }
+
+
+def deliver(notifications):
+    """Write notifications in one bulk_create and publish them to their users"""
+    from messaging.events import notification_payload, publish
+
+    window = _config().get('COALESCE_WINDOW', 0)
+    if window:
+        duplicates = _recent_duplicates(notifications, window)
+        notifications = [
+            notification for notification in notifications
+            if (str(notification.user_id), notification.event_key) not in duplicates
+        ]
+    if not notifications:
+        return []
+
+    created = Notification.objects.bulk_create(notifications)
+    for notification in created:
+        publish([notification.user_id], 'notification.created', notification_payload(notification))
+    return created
+
+
+@task
+def deliver_notifications(notifications):
+    """Task form of deliver(), taking notifications as dicts of Notification fields"""
+    return deliver([Notification(**fields) for fields in notifications])
+
+
+@contextmanager
+def batch():
+    """
+    Collect the notifications committed during the block and enqueue them as
+    one delivery when it exits. Open it outside the transaction the
+    notifications are raised in: those committing after the block are
+    delivered on their own.
+    """
+    if _current_batch.get() is not None:
+        yield _current_batch.get()
+        return
+    pending = NotificationBatch()
+    token = _current_batch.set(pending)
+    try:
+        yield pending
+    finally:
+        _current_batch.reset(token)
+    pending.flush()
+
+
+class NotificationBatchMiddleware:
+    """Write all notifications committed while handling a request in one batch"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with batch():
+            return self.get_response(request)
+
+
+def notify(user, type, title, message, key=None):
+    """
+    Queue a notification for `user` (a User or user id) once the current
+    transaction commits; a rollback, including of a savepoint, discards it.
+    `key` identifies the event, for coalescing (see above).
+    """
+    user_id = getattr(user, 'pk', user)
+    transaction.on_commit(lambda: _collect(user_id, type, title, message, key))
+
+
+def _collect(user, type, title, message, key):
+    pending = _current_batch.get()
+    if pending is not None:
+        pending.add(user, type, title, message, key)
+        return
+    single = NotificationBatch()
+    single.add(user, type, title, message, key)
+    single.flush()
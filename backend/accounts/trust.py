@@ -0,0 +1,79 @@
+"""
+Trust score formula.
+
+A user's trust score is composed from running aggregates kept on the user
+row, so it is recomputed by the same single UPDATE that changes them,
+without re-reading the user's reviews:
+
+    review score  average rating received (rating_sum / rating_count), or
+                  DEFAULT_REVIEW_SCORE before the first review
+    swap bonus    SWAP_BONUS per completed swap
+
+    trust_score = clamp(review score + swap bonus, 0, MAX_TRUST_SCORE)
+
+trust_score_expression() is the formula as a database expression and
+trust_score() the same formula in Python; the recompute_trust_scores
+command rebuilds the aggregates from the reviews table.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db.models import Case, DecimalField, F, FloatField, Value, When
+from django.db.models.functions import Cast, Greatest, Least, Round
+from django.db.models.lookups import GreaterThan
+
+from jobs.queue import enqueue
+from .models import User
+
+DEFAULT_REVIEW_SCORE = Decimal('5.00')
+SWAP_BONUS = Decimal('0.25')
+# trust_score is a DecimalField(max_digits=3, decimal_places=2)
+MAX_TRUST_SCORE = Decimal('9.99')
+MIN_TRUST_SCORE = Decimal('0.00')
+
+
+def trust_score(rating_sum, rating_count, total_swaps):
+    review_score = Decimal(rating_sum) / rating_count if rating_count else DEFAULT_REVIEW_SCORE
+    score = review_score + SWAP_BONUS * total_swaps
+    return min(MAX_TRUST_SCORE, max(MIN_TRUST_SCORE, score)).quantize(Decimal('0.01'), ROUND_HALF_UP)
+
+
+def trust_score_expression(rating_sum=F('rating_sum'), rating_count=F('rating_count'),
+                           total_swaps=F('total_swaps')):
+    """
+    The formula over column expressions. In an UPDATE that also changes an
+    aggregate, pass the aggregate's new value (e.g. F('total_swaps') + 1),
+    as SQL evaluates the right-hand side against the row before the update.
+    """
+    output = DecimalField(max_digits=6, decimal_places=2)
+    # Divide as floats: SQLite would truncate an integer (or NUMERIC) division
+    average = Cast(Cast(rating_sum, FloatField()) / rating_count, DecimalField(max_digits=10, decimal_places=4))
+    review_score = Case(
+        When(GreaterThan(rating_count, 0), then=average),
+        default=Value(DEFAULT_REVIEW_SCORE),
+        output_field=output
+    )
+    score = review_score + total_swaps * Value(SWAP_BONUS)
+    return Round(
+        Greatest(Value(MIN_TRUST_SCORE), Least(Value(MAX_TRUST_SCORE), score, output_field=output)),
+        2, output_field=output
+    )
+
+
+def record_review(user_id, rating_delta, count_delta=1):
+    """
+    Apply a change to a user's received reviews (+rating, +1 when created;
+    -rating, -1 when deleted; the rating difference, 0 when edited) and
+    recompute the trust score in the same UPDATE.
+    """
+    from matching.signals import owner_changed
+    from matching.snapshot import record_change
+
+    rating_sum = F('rating_sum') + rating_delta
+    rating_count = F('rating_count') + count_delta
+    User.objects.filter(pk=user_id).update(
+        rating_sum=rating_sum,
+        rating_count=rating_count,
+        trust_score=trust_score_expression(rating_sum=rating_sum, rating_count=rating_count),
+    )
+    record_change(owner_ids=[user_id])
+    enqueue(owner_changed, str(user_id))
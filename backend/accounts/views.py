@@ -3,6 +3,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from django.contrib.auth import get_user_model
+from backend.pagination import CreatedAtCursorPagination
 from .models import TrustBadge, Notification
 from .serializers import (
     UserSerializer, UserRegistrationSerializer,
@@ -46,9 +47,10 @@ class UserViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
     def notifications(self, request):
-        notifications = request.user.notifications.all()
+        paginator = CreatedAtCursorPagination()
+        notifications = paginator.paginate_queryset(request.user.notifications.all(), request, view=self)
         serializer = NotificationSerializer(notifications, many=True)
-        return Response(serializer.data)
+        return paginator.get_paginated_response(serializer.data)
     
     @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def mark_notifications_read(self, request):
@@ -0,0 +1,20 @@
+import os
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+# Initialise Django before importing consumers, which import models
+django_application = get_asgi_application()
+
+try:
+    from channels.routing import ProtocolTypeRouter, URLRouter
+except ImportError:  # Without Channels, serve HTTP only; clients fall back to long-polling
+    application = django_application
+else:
+    from messaging.consumers import JWTQueryAuthMiddleware
+    from messaging.routing import websocket_urlpatterns
+
+    application = ProtocolTypeRouter({
+        'http': django_application,
+        'websocket': JWTQueryAuthMiddleware(URLRouter(websocket_urlpatterns)),
+    })
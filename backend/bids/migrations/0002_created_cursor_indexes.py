@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-17 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bids', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bidding',
+            index=models.Index(fields=['bidder', '-created_at', '-id'], name='bid_bidder_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bidding',
+            index=models.Index(fields=['product', '-created_at', '-id'], name='bid_product_created_idx'),
+        ),
+    ]
@@ -24,6 +24,10 @@ class Bidding(models.Model):
     class Meta:
         ordering = ['-created_at']
         unique_together = ['bidder', 'product']
+        indexes = [
+            models.Index(fields=['bidder', '-created_at', '-id'], name='bid_bidder_created_idx'),
+            models.Index(fields=['product', '-created_at', '-id'], name='bid_product_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.bidder.email} - {self.product.title}"
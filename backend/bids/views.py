@@ -2,19 +2,23 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.db.models import Q
+from backend.pagination import CreatedAtCursorPagination
+from products.models import Product
 from .models import Bidding
 from .serializers import BiddingSerializer, BiddingCreateSerializer
-from accounts.models import Notification
+from accounts.notifications import notify
 
 
 class BiddingViewSet(viewsets.ModelViewSet):
     serializer_class = BiddingSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
 
     def get_queryset(self):
         user = self.request.user
+        # A subquery rather than a join on product__owner, so either side of the OR can use an index
         return Bidding.objects.filter(
-            Q(bidder=user) | Q(product__owner=user)
+            Q(bidder=user) | Q(product__in=Product.objects.filter(owner=user).values('id'))
         ).select_related('bidder', 'product', 'offered_product')
 
     def get_serializer_class(self):
@@ -24,11 +28,12 @@ class BiddingViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         bid = serializer.save(bidder=self.request.user)
-        Notification.objects.create(
+        notify(
             user=bid.product.owner,
             type='bid',
             title='New Bid',
-            message=f'{self.request.user.email} bid on your {bid.product.title}!'
+            message=f'{self.request.user.email} bid on your {bid.product.title}!',
+            key=f'bid_created:{bid.pk}'
         )
 
     @action(detail=True, methods=['post'])
@@ -40,11 +45,12 @@ class BiddingViewSet(viewsets.ModelViewSet):
         bid.status = 'accepted'
         bid.save()
         
-        Notification.objects.create(
+        notify(
             user=bid.bidder,
             type='bid',
             title='Bid Accepted',
-            message=f'Your bid on {bid.product.title} was accepted!'
+            message=f'Your bid on {bid.product.title} was accepted!',
+            key=f'bid_accepted:{bid.pk}'
         )
         
         return Response(BiddingSerializer(bid).data)
@@ -0,0 +1,155 @@
+"""
+Per-request profiling: SQL query count, DB time, serializer time and view
+time, reported as a Server-Timing header and one structured log line.
+Repeated query shapes are counted to flag likely N+1 patterns.
+
+Configured with REQUEST_PROFILING in settings:
+    'ENABLED': turn the middleware on
+    'SAMPLE_RATE': fraction of requests to profile (0.0 - 1.0)
+    'SERVER_TIMING': add the Server-Timing header to profiled responses
+    'N_PLUS_ONE_THRESHOLD': executions of one query shape that flag an N+1
+"""
+import contextvars
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('swapsmart.profiling')
+
+_current = contextvars.ContextVar('request_profile', default=None)
+
+_IN_LIST = re.compile(r'IN \((?:%s|\?)(?:, (?:%s|\?))*\)')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+
+
+def query_shape(sql):
+    """Normalize SQL so that queries differing only in parameters compare equal"""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    return _IN_LIST.sub('IN (...)', sql)
+
+
+class RequestProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.view_started = None
+        self.view_time = 0.0
+        self.shapes = Counter()
+        self._serializer_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+            self.shapes[query_shape(sql)] += 1
+
+    def n_plus_one(self, threshold):
+        return [
+            {'count': count, 'query': shape[:300]}
+            for shape, count in self.shapes.most_common()
+            if count >= threshold
+        ]
+
+
+def profiled_serializer_data(data_property):
+    """Wrap BaseSerializer.data so only the outermost serializer is timed"""
+    def data(self):
+        profile = _current.get()
+        if profile is None:
+            return data_property.fget(self)
+        profile._serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return data_property.fget(self)
+        finally:
+            profile._serializer_depth -= 1
+            if profile._serializer_depth == 0:
+                profile.serializer_time += time.perf_counter() - started
+    data._profiled = True
+    return property(data)
+
+
+def install_serializer_hook():
+    from rest_framework.serializers import BaseSerializer
+    if not getattr(BaseSerializer.data.fget, '_profiled', False):
+        BaseSerializer.data = profiled_serializer_data(BaseSerializer.data)
+
+
+class RequestProfilingMiddleware:
+    def __init__(self, get_response):
+        config = getattr(settings, 'REQUEST_PROFILING', {})
+        if not config.get('ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = config.get('SAMPLE_RATE', 1.0)
+        self.server_timing = config.get('SERVER_TIMING', True)
+        self.threshold = config.get('N_PLUS_ONE_THRESHOLD', 5)
+        install_serializer_hook()
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        profile = RequestProfile()
+        token = _current.set(profile)
+        request._profile = profile
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        if profile.view_started is not None:
+            profile.view_time = time.perf_counter() - profile.view_started
+        total = time.perf_counter() - profile.started
+        self.report(request, response, profile, total)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = getattr(request, '_profile', None)
+        if profile is not None:
+            profile.view_started = time.perf_counter()
+
+    def report(self, request, response, profile, total):
+        n_plus_one = profile.n_plus_one(self.threshold)
+
+        if self.server_timing:
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={profile.db_time * 1000:.1f};desc="{profile.queries} queries"',
+                f'serializer;dur={profile.serializer_time * 1000:.1f}',
+                f'view;dur={profile.view_time * 1000:.1f}',
+                f'total;dur={total * 1000:.1f}',
+            ])
+
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': profile.queries,
+            'db_ms': round(profile.db_time * 1000, 1),
+            'serializer_ms': round(profile.serializer_time * 1000, 1),
+            'view_ms': round(profile.view_time * 1000, 1),
+            'total_ms': round(total * 1000, 1),
+            'n_plus_one': n_plus_one,
+        }
+        if n_plus_one:
+            logger.warning(json.dumps(record))
+        else:
+            logger.info(json.dumps(record))
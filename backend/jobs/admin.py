@@ -0,0 +1,11 @@
+from django.contrib import admin
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['task', 'status', 'attempts', 'max_attempts', 'run_at', 'created_at']
+    list_filter = ['status', 'task']
+    search_fields = ['task', 'idempotency_key']
+    ordering = ['-created_at']
+    readonly_fields = ['created_at', 'updated_at']
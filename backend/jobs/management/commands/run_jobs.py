@@ -0,0 +1,40 @@
+import signal
+import threading
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.queue import work
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (TASKS BACKEND "database")'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10,
+                            help='Jobs claimed per poll')
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='Seconds to wait between polls when no job is due')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once no job is due, e.g. when run from a scheduler')
+        parser.add_argument('--purge-days', type=int, default=7,
+                            help='Delete succeeded jobs older than this many days on start (0 keeps them)')
+
+    def handle(self, *args, **options):
+        if options['purge_days']:
+            purged, _ = Job.objects.filter(
+                status='succeeded', updated_at__lt=timezone.now() - timedelta(days=options['purge_days'])
+            ).delete()
+            if purged:
+                self.stdout.write(f'Purged {purged} succeeded jobs')
+
+        stop = threading.Event()
+        if not options['once']:
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, lambda *_: stop.set())
+            self.stdout.write('Waiting for jobs')
+
+        processed = work(options['batch_size'], options['interval'], once=options['once'], stop=stop)
+        self.stdout.write(self.style.SUCCESS(f'Ran {processed} jobs'))
@@ -0,0 +1,206 @@
+"""
+Background task queue for post-commit side effects.
+
+A task is a module-level function decorated with @task; enqueue() schedules
+it with JSON-serializable arguments. Tasks are addressed by dotted path, so
+any process that can import the function can run it.
+
+Configured with TASKS in settings:
+    'BACKEND': 'database'  jobs are rows written in the caller's transaction
+                           and run by the run_jobs worker command, or by a
+                           scheduler calling RunJobsView
+               'thread'    jobs run in this process's worker threads once
+                           the transaction commits (local development)
+               'immediate' jobs run in the committing request (opt-in only;
+                           match refreshes make such requests slow)
+    'WORKERS': worker threads of the thread backend
+    'MAX_ATTEMPTS': default attempts before a job is given up on
+    'RETRY_DELAY': seconds before the first retry, doubled on each retry
+    'LEASE': seconds a database job may run before another worker may
+             claim it again
+    'KEY_TTL': seconds an idempotency key is remembered by the in-process
+               backends (the database backend keeps it with the job row)
+    'CRON_SECRET': bearer token RunJobsView requires (disabled when empty)
+    'CRON_DURATION': seconds RunJobsView keeps claiming jobs
+
+An idempotency key makes enqueue() a no-op when a job with the same key was
+already enqueued, so a side effect tied to a one-off event runs once even if
+the code recording the event runs twice.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _config():
+    return getattr(settings, 'TASKS', {})
+
+
+def task(func=None, *, max_attempts=None):
+    """Mark a function as a task; `max_attempts` overrides TASKS['MAX_ATTEMPTS']"""
+    def decorate(func):
+        func.task_name = f'{func.__module__}.{func.__qualname__}'
+        func.max_attempts = max_attempts or _config().get('MAX_ATTEMPTS', 3)
+        return func
+    return decorate(func) if func is not None else decorate
+
+
+def retry_delay(attempt):
+    """Seconds to wait before retrying after `attempt` failed attempts"""
+    return _config().get('RETRY_DELAY', 5) * 2 ** (attempt - 1)
+
+
+def enqueue(func, *args, key=None, **kwargs):
+    """
+    Run task `func(*args, **kwargs)` in the background once the current
+    transaction commits; a rollback discards the job. Nothing is run if a
+    job with idempotency key `key` was enqueued before.
+    """
+    if _config().get('BACKEND', 'thread') == 'database':
+        _enqueue_job(func, args, kwargs, key)
+    else:
+        transaction.on_commit(lambda: _dispatch(func, args, kwargs, key))
+
+
+def _enqueue_job(func, args, kwargs, key):
+    from .models import Job
+
+    if key is not None and Job.objects.filter(idempotency_key=key).exists():
+        return
+    # The unique key settles a race between two enqueues: one row is kept
+    Job.objects.bulk_create([Job(
+        task=func.task_name, args=list(args), kwargs=kwargs,
+        idempotency_key=key, max_attempts=func.max_attempts
+    )], ignore_conflicts=key is not None)
+
+
+def _dispatch(func, args, kwargs, key):
+    if key is not None and not cache.add(f'jobs:key:{key}', True, _config().get('KEY_TTL', 86400)):
+        return
+    if _config().get('BACKEND', 'thread') == 'thread':
+        _background().submit(_run_in_background, func, args, kwargs, 1)
+    else:
+        _run_immediately(func, args, kwargs)
+
+
+def _run_immediately(func, args, kwargs):
+    for attempt in range(1, func.max_attempts + 1):
+        try:
+            func(*args, **kwargs)
+            return
+        except Exception:
+            if attempt == func.max_attempts:
+                logger.exception('Task %s failed after %d attempts', func.task_name, attempt)
+
+
+def _background():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=_config().get('WORKERS', 1), thread_name_prefix='jobs'
+            )
+    return _executor
+
+
+def _run_in_background(func, args, kwargs, attempt):
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        if attempt >= func.max_attempts:
+            logger.exception('Task %s failed after %d attempts', func.task_name, attempt)
+        else:
+            logger.warning('Task %s failed (attempt %d), retrying', func.task_name, attempt, exc_info=True)
+            timer = threading.Timer(
+                retry_delay(attempt),
+                lambda: _background().submit(_run_in_background, func, args, kwargs, attempt + 1)
+            )
+            timer.daemon = True
+            timer.start()
+    finally:
+        close_old_connections()
+
+
+def claim_jobs(limit):
+    """
+    Claim up to `limit` due jobs for this worker: pending jobs whose run_at
+    has passed, and running jobs whose lease expired (their worker died).
+    Each claim is a conditional update, so concurrent workers never run the
+    same attempt twice.
+    """
+    from .models import Job
+
+    now = timezone.now()
+    due = Job.objects.filter(
+        Q(status='pending', run_at__lte=now) | Q(status='running', locked_until__lt=now)
+    ).order_by('run_at')[:limit]
+    lease = now + timedelta(seconds=_config().get('LEASE', 300))
+    claimed = []
+    for job in due:
+        if Job.objects.filter(pk=job.pk, status=job.status, attempts=job.attempts).update(
+            status='running', attempts=F('attempts') + 1, locked_until=lease, updated_at=now
+        ):
+            job.attempts += 1
+            claimed.append(job)
+    return claimed
+
+
+def run_job(job):
+    """Run a claimed job and record the outcome; returns True if it succeeded"""
+    from .models import Job
+
+    try:
+        func = import_string(job.task)
+        func(*job.args, **job.kwargs)
+    except Exception as exc:
+        given_up = job.attempts >= job.max_attempts
+        log = logger.exception if given_up else logger.warning
+        log('Job %s (%s) failed on attempt %d', job.pk, job.task, job.attempts, exc_info=True)
+        Job.objects.filter(pk=job.pk, status='running').update(
+            status='failed' if given_up else 'pending',
+            run_at=timezone.now() + timedelta(seconds=retry_delay(job.attempts)),
+            locked_until=None,
+            last_error=f'{type(exc).__name__}: {exc}',
+            updated_at=timezone.now(),
+        )
+        return False
+    Job.objects.filter(pk=job.pk, status='running').update(
+        status='succeeded', locked_until=None, updated_at=timezone.now()
+    )
+    return True
+
+
+def work(batch_size=10, interval=1.0, once=False, stop=None, duration=None):
+    """
+    Run due jobs until `stop` is set (or, with `once`, until none is due),
+    sleeping `interval` seconds when idle; with `duration`, no new batch is
+    claimed once that many seconds have passed. Returns the number of jobs run.
+    """
+    stop = stop or threading.Event()
+    deadline = None if duration is None else time.monotonic() + duration
+    processed = 0
+    while not stop.is_set() and (deadline is None or time.monotonic() < deadline):
+        jobs = claim_jobs(batch_size)
+        for job in jobs:
+            run_job(job)
+            processed += 1
+        close_old_connections()
+        if once and not jobs:
+            break
+        if not jobs:
+            time.sleep(interval)
+    return processed
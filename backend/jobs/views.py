@@ -0,0 +1,37 @@
+import secrets
+
+from django.conf import settings
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .queue import work
+
+
+class HasCronSecret(permissions.BasePermission):
+    """Allows requests carrying `Authorization: Bearer <TASKS['CRON_SECRET']>`"""
+
+    def has_permission(self, request, view):
+        secret = settings.TASKS.get('CRON_SECRET')
+        if not secret:
+            return False
+        return secrets.compare_digest(request.headers.get('Authorization', ''), f'Bearer {secret}')
+
+
+class RunJobsView(APIView):
+    """
+    Run the queued jobs that are due, for deployments that cannot keep a
+    run_jobs worker running (e.g. called by a Vercel cron job, which sends
+    the CRON_SECRET environment variable as a bearer token).
+    """
+    authentication_classes = []
+    permission_classes = [HasCronSecret]
+
+    def get(self, request):
+        if settings.TASKS.get('BACKEND') != 'database':
+            return Response(
+                {'error': 'Jobs are only queued with the database backend'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        processed = work(once=True, duration=settings.TASKS.get('CRON_DURATION', 20))
+        return Response({'processed': processed})
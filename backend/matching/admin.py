@@ -0,0 +1,10 @@
+from django.contrib import admin
+from .models import ProductMatch
+
+
+@admin.register(ProductMatch)
+class ProductMatchAdmin(admin.ModelAdmin):
+    list_display = ['product', 'matched_product', 'compatibility_score', 'computed_at']
+    search_fields = ['product__title', 'matched_product__title']
+    ordering = ['-computed_at']
+    raw_id_fields = ['product', 'matched_product']
@@ -1,6 +1,42 @@
 import math
+import uuid
 from decimal import Decimal
 from django.db import models
+import numpy as np
+
+
+class UUIDColumn:
+    """Compact column of UUIDs, 16 bytes each, handing out uuid.UUID objects"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self._order = None
+
+    @classmethod
+    def from_uuids(cls, values):
+        return cls(np.frombuffer(b''.join(value.bytes for value in values), dtype='V16'))
+
+    def __len__(self):
+        return len(self.raw)
+
+    def __getitem__(self, index):
+        if isinstance(index, np.ndarray):
+            return UUIDColumn(self.raw[index])
+        return uuid.UUID(bytes=self.raw[index].tobytes())
+
+    def __iter__(self):
+        return (uuid.UUID(bytes=value.tobytes()) for value in self.raw)
+
+    def positions(self, values):
+        """Index of each of the given UUIDs in the column, -1 where absent"""
+        wanted = np.frombuffer(b''.join(value.bytes for value in values), dtype='S16')
+        if not len(self.raw):
+            return np.full(len(wanted), -1)
+        if self._order is None:
+            self._order = np.argsort(self.raw.view('S16'), kind='stable')
+        keys = self.raw.view('S16')[self._order]
+        found = np.minimum(np.searchsorted(keys, wanted), len(keys) - 1)
+        return np.where(keys[found] == wanted, self._order[found], -1)
 
 
 class FairnessEngine:
@@ -81,10 +117,11 @@ class FairnessEngine:
             return max(0, 100 - (distance / 10))
 
     @classmethod
-    def calculate_compatibility(cls, product1, product2):
+    def compatibility_breakdown(cls, product1, product2):
         """
-        Calculate overall compatibility score between two products
-        Returns a score from 0-100
+        Calculate every factor and the overall compatibility score between two products.
+        The factors are summed in the batch scorer's order and rounded the
+        same way, so the score matches stored and batch scores exactly.
         """
         value_sim = cls.calculate_value_similarity(
             float(product1.estimated_value),
@@ -106,54 +143,356 @@ class FairnessEngine:
             product2.latitude, product2.longitude
         )
         
-        score = (
-            (value_sim * 0.35) +
-            (trust * 0.25) +
-            (condition * 0.20) +
-            (proximity * 0.20)
-        )
+        score = (value_sim * 0.35) + (trust * 0.25) + (condition * 0.20)
+        score = score + (proximity * 0.20)
         
-        return round(score, 2)
+        return {
+            # np.round(score, 2) without the array overhead: both round score * 100 half to even
+            'compatibility_score': round(score * 100) / 100,
+            'value_similarity': value_sim,
+            'trust_factor': trust,
+            'condition_factor': condition,
+            'proximity_factor': proximity,
+        }
+
+    @classmethod
+    def calculate_compatibility(cls, product1, product2):
+        """
+        Calculate overall compatibility score between two products
+        Returns a score from 0-100
+        """
+        return cls.compatibility_breakdown(product1, product2)['compatibility_score']
+
+    @staticmethod
+    def batch_value_similarity(values1, values2):
+        """Vectorized value similarity; arguments broadcast against each other"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = np.minimum(values1, values2) / np.maximum(values1, values2)
+        return np.where((values1 > 0) & (values2 > 0), ratio * 100, 0.0)
+
+    @staticmethod
+    def batch_trust_factor(trust_scores1, trust_scores2):
+        """Vectorized trust factor; arguments broadcast against each other"""
+        return (trust_scores1 + trust_scores2) / 2 * 10
+
+    @staticmethod
+    def batch_condition_factor(condition_values1, condition_values2):
+        """Vectorized condition factor; takes condition values, not condition codes"""
+        return np.minimum(condition_values1, condition_values2)
+
+    @staticmethod
+    def batch_haversine_distance(lats1, lons1, lats2, lons2):
+        """Vectorized distance in km; NaN coordinates give NaN distances"""
+        R = 6371
+
+        lats1, lons1, lats2, lons2 = map(np.radians, (lats1, lons1, lats2, lons2))
+
+        a = np.sin((lats2 - lats1) / 2) ** 2 + np.cos(lats1) * np.cos(lats2) * np.sin((lons2 - lons1) / 2) ** 2
+        return R * 2 * np.arcsin(np.sqrt(a))
+
+    @staticmethod
+    def batch_proximity_factor(distances):
+        """Vectorized proximity factor, same bands as calculate_proximity_factor"""
+        with np.errstate(invalid='ignore'):
+            return np.select(
+                [np.isnan(distances), distances <= 10, distances <= 50, distances <= 100,
+                 distances <= 250, distances <= 500],
+                [50, 100, 80, 60, 40, 20],
+                default=np.maximum(0, 100 - distances / 10)
+            )
+
+    @staticmethod
+    def batch_proximity_bound(min_distances):
+        """
+        Highest proximity factor of any pair at least `min_distances` km apart.
+        The factor is not monotonic: just past 500 km it is back near 50.
+        """
+        with np.errstate(invalid='ignore'):
+            return np.select(
+                [np.isnan(min_distances), min_distances <= 10, min_distances <= 50, min_distances <= 100,
+                 min_distances <= 500],
+                [50, 100, 80, 60, 50],
+                default=np.maximum(0, 100 - min_distances / 10)
+            )
+
+    @staticmethod
+    def batch_distance_bound(lats1, lons1, lats2, lons2):
+        """
+        Cheap lower bound of batch_haversine_distance from latitudes alone:
+        no path between two parallels is shorter than the meridian arc
+        between them. Any NaN coordinate gives NaN, as it does there.
+        """
+        with np.errstate(invalid='ignore'):
+            # Slack for haversine's float error, so the bound never exceeds it
+            bound = np.maximum(0, 6371 * np.abs(np.radians(lats1 - lats2)) - 1e-6)
+        return np.where(np.isnan(lons1) | np.isnan(lons2), np.nan, bound)
+
+    @staticmethod
+    def batch_partial_score(value_sims, trust_factors, condition_factors):
+        """Weighted sum of every factor but proximity, which is the costly one"""
+        return (value_sims * 0.35) + (trust_factors * 0.25) + (condition_factors * 0.20)
+
+    @staticmethod
+    def batch_compatibility_score(partial_scores, proximity_factors):
+        """
+        Final score from batch_partial_score and the proximity factor; every
+        batch path rounds here, and compatibility_breakdown the same way
+        """
+        return np.round(partial_scores + (proximity_factors * 0.20), 2)
+
+    @classmethod
+    def load_candidate_columns(cls, queryset):
+        """
+        Load only the scoring inputs of a product queryset as compact typed
+        column arrays. Owners are stored as small integer codes, see `owner_codes`.
+        """
+        rows = list(queryset.values_list(
+            'id', 'estimated_value', 'condition', 'latitude', 'longitude', 'owner__trust_score', 'owner_id'
+        ))
+        count = len(rows)
+        owner_codes = {}
+
+        def column(index, convert, dtype=np.float64):
+            return np.fromiter((convert(row[index]) for row in rows), dtype=dtype, count=count)
+
+        def optional(value):
+            return np.nan if value is None else float(value)
+
+        return {
+            'ids': UUIDColumn.from_uuids(row[0] for row in rows),
+            'value': column(1, float),
+            'condition': column(2, lambda code: cls.CONDITION_VALUES.get(code, 50), dtype=np.uint8),
+            'latitude': column(3, optional),
+            'longitude': column(4, optional),
+            'trust': column(5, float),
+            'owner': column(6, lambda owner_id: owner_codes.setdefault(owner_id, len(owner_codes)), dtype=np.int32),
+            'owner_codes': owner_codes,
+        }
+
+    @staticmethod
+    def patch_candidate_columns(columns, drop, fresh):
+        """
+        New candidate columns with the rows masked by `drop` removed and the
+        rows of `fresh` (load_candidate_columns) written in; a fresh row
+        replaces the row with its id in place, other fresh rows are appended.
+        Neither input is modified.
+        """
+        owner_codes = dict(columns['owner_codes'])
+        recode = np.fromiter(
+            (owner_codes.setdefault(owner_id, len(owner_codes)) for owner_id in fresh['owner_codes']),
+            dtype=np.int32, count=len(fresh['owner_codes'])
+        )
+        positions = columns['ids'].positions(fresh['ids'])
+        replaced = positions >= 0
+        fresh = dict(fresh, owner=recode[fresh['owner']], ids=fresh['ids'].raw)
+        patched = dict(columns, ids=columns['ids'].raw)
+        keep = ~drop
+        keep[positions[replaced]] = True
+
+        for key in ('ids', 'value', 'condition', 'latitude', 'longitude', 'trust', 'owner'):
+            column = patched[key].copy()
+            column[positions[replaced]] = fresh[key][replaced]
+            patched[key] = np.concatenate([column[keep], fresh[key][~replaced]])
+        patched['ids'] = UUIDColumn(patched['ids'])
+        patched['owner_codes'] = owner_codes
+        return patched
+
+    @staticmethod
+    def candidate_sources(columns, indices):
+        """Source columns for candidates at `indices`, to score the catalogue against itself"""
+        return {
+            key: columns[key][indices][:, None]
+            for key in ('value', 'condition', 'latitude', 'longitude', 'trust', 'owner')
+        }
+
+    @classmethod
+    def source_columns(cls, products, columns):
+        """Scoring inputs of source products as column vectors, to broadcast against candidate rows"""
+        def column(values, dtype=float):
+            return np.fromiter(values, dtype=dtype, count=len(products))[:, None]
+
+        def coordinate(product, value):
+            if product.latitude is None or product.longitude is None:
+                return np.nan
+            return float(value)
+
+        return {
+            'value': column(float(p.estimated_value) for p in products),
+            'condition': column(cls.CONDITION_VALUES.get(p.condition, 50) for p in products),
+            'latitude': column(coordinate(p, p.latitude) for p in products),
+            'longitude': column(coordinate(p, p.longitude) for p in products),
+            'trust': column(float(p.owner.trust_score) for p in products),
+            'owner': column((columns['owner_codes'].get(p.owner_id, -1) for p in products), dtype=int),
+        }
+
+    @staticmethod
+    def _top_indices(scores, limit, min_score):
+        """Indices of the `limit` best scores reaching min_score, best first, ties in input order"""
+        keep = np.flatnonzero(scores >= min_score)
+        if len(keep) > limit:
+            keep = keep[scores[keep] >= np.partition(scores[keep], -limit)[-limit]]
+        return keep[np.argsort(-scores[keep], kind='stable')][:limit]
+
+    @classmethod
+    def select_top_many(cls, products, columns, limit, min_score):
+        """
+        Bounded top-K selection of several source products over candidate
+        columns, as one matrix pass (sources x candidates). Candidates owned
+        by a source's own owner are skipped.
+
+        Value, trust and condition are cheap, so they are scored for every
+        pair first. The latitude difference of a pair bounds its distance from
+        below, and so its proximity factor from above (batch_distance_bound,
+        batch_proximity_bound);
+        a pair whose partial score plus that bound cannot reach the K-th best
+        partial score of its row (or min_score) is dropped before any
+        distance is computed. The bound is exact, so pruning never changes
+        the result.
+
+        Returns one (candidate indices best first, factors) pair per source.
+        """
+        if not len(products):
+            return []
+        return cls.select_top_sources(cls.source_columns(products, columns), columns, limit, min_score)
+
+    @classmethod
+    def select_top_sources(cls, sources, columns, limit, min_score):
+        """
+        select_top_many over source columns (see source_columns) rather than
+        model instances, so it can run where there is no database.
+        """
+        count = len(sources['value'])
+        if limit <= 0 or not len(columns['ids']):
+            return [(np.array([], dtype=int), {}) for _ in range(count)]
+
+        value_sim = cls.batch_value_similarity(sources['value'], columns['value'])
+        trust = cls.batch_trust_factor(sources['trust'], columns['trust'])
+        condition = cls.batch_condition_factor(sources['condition'], columns['condition'])
+        partial = cls.batch_partial_score(value_sim, trust, condition)
+        partial[sources['owner'] == columns['owner']] = -np.inf
+
+        # Every candidate scores at least its partial score, so the K-th best
+        # partial score of a row is a floor for its K-th best final score.
+        threshold = np.full(count, float(min_score))
+        if partial.shape[1] > limit:
+            threshold = np.maximum(threshold, np.partition(partial, -limit, axis=1)[:, -limit])
+        proximity_bound = cls.batch_proximity_bound(cls.batch_distance_bound(
+            sources['latitude'], sources['longitude'], columns['latitude'], columns['longitude']
+        ))
+        # 0.01 of slack covers rounding the final score to two decimals
+        rows, cols = np.nonzero(partial + (proximity_bound * 0.20) >= threshold[:, None] - 0.01)
+
+        proximity = cls.batch_proximity_factor(cls.batch_haversine_distance(
+            sources['latitude'][rows, 0], sources['longitude'][rows, 0],
+            columns['latitude'][cols], columns['longitude'][cols]
+        ))
+        scores = cls.batch_compatibility_score(partial[rows, cols], proximity)
+
+        results = []
+        bounds = np.searchsorted(rows, np.arange(count + 1))
+        for row, (start, end) in enumerate(zip(bounds[:-1], bounds[1:])):
+            keep = start + cls._top_indices(scores[start:end], limit, min_score)
+            top = cols[keep]
+            results.append((top, {
+                'compatibility_score': scores[keep],
+                'value_similarity': value_sim[row, top],
+                'trust_factor': trust[row, top],
+                'condition_factor': condition[row, top],
+                'proximity_factor': proximity[keep],
+            }))
+        return results
+
+    @classmethod
+    def score_many(cls, products, columns, indices):
+        """
+        Scores and factors of several source products against the candidates
+        at `indices`, unpruned, as (sources x candidates) matrices.
+        Candidates owned by a source's own owner score -inf.
+        """
+        sources = cls.source_columns(products, columns)
+        candidates = {
+            key: columns[key][indices] for key in ('value', 'condition', 'latitude', 'longitude', 'trust', 'owner')
+        }
+        value_sim = cls.batch_value_similarity(sources['value'], candidates['value'])
+        trust = cls.batch_trust_factor(sources['trust'], candidates['trust'])
+        condition = cls.batch_condition_factor(sources['condition'], candidates['condition'])
+        proximity = cls.batch_proximity_factor(cls.batch_haversine_distance(
+            sources['latitude'], sources['longitude'], candidates['latitude'], candidates['longitude']
+        ))
+        scores = cls.batch_compatibility_score(cls.batch_partial_score(value_sim, trust, condition), proximity)
+        scores[sources['owner'] == candidates['owner']] = -np.inf
+        return scores, {
+            'compatibility_score': scores,
+            'value_similarity': value_sim,
+            'trust_factor': trust,
+            'condition_factor': condition,
+            'proximity_factor': proximity,
+        }
+
+    @classmethod
+    def select_top(cls, product, columns, limit, min_score):
+        """Bounded top-K selection for a single product, see select_top_many"""
+        return cls.select_top_many([product], columns, limit, min_score)[0]
 
     @classmethod
     def find_best_matches(cls, product, limit=10, min_score=30):
         """
-        Find the best matching products for a given product
+        Find the best matching products for a given product.
+        Candidates come from the process-wide catalogue snapshot.
+        """
+        from .snapshot import get_snapshot
+
+        columns = get_snapshot().columns
+        return cls.build_matches(columns, [cls.select_top(product, columns, limit, min_score)])[0]
+
+    @classmethod
+    def build_matches(cls, columns, selections):
+        """
+        Turn (indices, factors) selections into match dicts, loading every
+        selected product with a single query
         """
         from products.models import Product
-        
-        candidates = Product.objects.filter(
+
+        ids = {columns['ids'][i] for top, factors in selections for i in top}
+        # Candidate columns may come from a slightly stale snapshot
+        products = Product.objects.filter(
             is_active=True,
-            is_available=True,
-            owner__is_active=True
-        ).exclude(
-            owner=product.owner
-        ).select_related('owner', 'category').prefetch_related('images')
-        
-        matches = []
-        for candidate in candidates:
-            score = cls.calculate_compatibility(product, candidate)
-            if score >= min_score:
+            is_available=True
+        ).select_related('owner', 'category').prefetch_related('images', 'owner__badges').in_bulk(ids)
+
+        results = []
+        for top, factors in selections:
+            matches = []
+            for rank, i in enumerate(top):
+                candidate = products.get(columns['ids'][i])
+                if candidate is None:
+                    continue
                 matches.append({
                     'product': candidate,
-                    'compatibility_score': score,
-                    'value_similarity': cls.calculate_value_similarity(
-                        float(product.estimated_value),
-                        float(candidate.estimated_value)
-                    ),
-                    'trust_factor': cls.calculate_trust_factor(
-                        product.owner.trust_score,
-                        candidate.owner.trust_score
-                    ),
-                    'condition_factor': cls.calculate_condition_factor(
-                        product.condition,
-                        candidate.condition
-                    ),
-                    'proximity_factor': cls.calculate_proximity_factor(
-                        product.latitude, product.longitude,
-                        candidate.latitude, candidate.longitude
-                    )
+                    'compatibility_score': float(factors['compatibility_score'][rank]),
+                    'value_similarity': float(factors['value_similarity'][rank]),
+                    'trust_factor': float(factors['trust_factor'][rank]),
+                    'condition_factor': int(factors['condition_factor'][rank]),
+                    'proximity_factor': float(factors['proximity_factor'][rank])
                 })
-        
-        matches.sort(key=lambda x: x['compatibility_score'], reverse=True)
-        return matches[:limit]
+            results.append(matches)
+        return results
+
+    @classmethod
+    def find_best_matches_for_products(cls, products, limit=10, min_score=30, block_size=32):
+        """
+        Find the best matches of several products at once. Candidates come
+        from the catalogue snapshot and are scored against blocks of
+        `block_size` source products per matrix pass.
+        Returns a dict of product id -> matches.
+        """
+        from .snapshot import get_snapshot
+
+        products = list(products)
+        columns = get_snapshot().columns
+        selections = []
+        for start in range(0, len(products), block_size):
+            selections.extend(cls.select_top_many(products[start:start + block_size], columns, limit, min_score))
+
+        matches = cls.build_matches(columns, selections)
+        return {product.id: product_matches for product, product_matches in zip(products, matches)}
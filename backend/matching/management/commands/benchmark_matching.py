@@ -0,0 +1,214 @@
+import json
+import platform
+import random
+import statistics
+import subprocess
+import time
+import tracemalloc
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+
+from matching.snapshot import bump_version
+
+CITIES = [
+    (40.7128, -74.0060), (34.0522, -118.2437), (41.8781, -87.6298), (51.5074, -0.1278),
+    (48.8566, 2.3522), (19.0760, 72.8777), (18.5204, 73.8567), (35.6762, 139.6503),
+]
+CONDITIONS = ['new', 'like_new', 'good', 'fair', 'poor']
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+
+    def pick(fraction):
+        return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+    return {
+        'p50_ms': round(pick(0.50) * 1000, 3),
+        'p95_ms': round(pick(0.95) * 1000, 3),
+        'p99_ms': round(pick(0.99) * 1000, 3),
+        'mean_ms': round(statistics.mean(ordered) * 1000, 3),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the FairnessEngine and matching endpoints on synthetic catalogues. '
+        'Runs against a throwaway test database, never the configured one.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', default='1000,10000,100000',
+                            help='Comma-separated catalogue sizes (products)')
+        parser.add_argument('--iterations', type=int, default=20,
+                            help='Timed calls per benchmark')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', default='benchmark-results.json',
+                            help='JSON file to write results to')
+        parser.add_argument('--compare', default=None,
+                            help='Earlier results file to print p50 changes against')
+
+    def handle(self, *args, **options):
+        scales = [int(scale) for scale in options['scales'].split(',') if scale]
+        random.seed(options['seed'])
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = {
+                'commit': self.git_commit(),
+                'python': platform.python_version(),
+                'database': connection.vendor,
+                'iterations': options['iterations'],
+                'seed': options['seed'],
+                'scales': {},
+            }
+            for scale in scales:
+                self.stdout.write(f'Generating catalogue of {scale} products')
+                self.reset()
+                self.generate(scale)
+                results['scales'][str(scale)] = self.run_scale(options['iterations'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        with open(options['output'], 'w') as f:
+            json.dump(results, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Wrote results to {options['output']}"))
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                self.compare(json.load(f), results)
+
+    def compare(self, before, after):
+        self.stdout.write(f"Compared with {before.get('commit') or 'earlier run'}:")
+        for scale, benchmarks in after['scales'].items():
+            for name, result in benchmarks.items():
+                previous = before.get('scales', {}).get(scale, {}).get(name)
+                if not previous or not previous['p50_ms']:
+                    continue
+                change = (result['p50_ms'] - previous['p50_ms']) / previous['p50_ms'] * 100
+                self.stdout.write(
+                    f"  {scale} {name}: p50 {previous['p50_ms']}ms -> {result['p50_ms']}ms ({change:+.1f}%), "
+                    f"queries {previous['queries_max']} -> {result['queries_max']}"
+                )
+
+    def git_commit(self):
+        try:
+            return subprocess.check_output(
+                ['git', 'rev-parse', 'HEAD'], text=True, stderr=subprocess.DEVNULL
+            ).strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def reset(self):
+        from accounts.models import User
+        from matching.models import ProductMatch
+        from products.models import Category, Product
+
+        ProductMatch.objects.all().delete()
+        Product.objects.all().delete()
+        Category.objects.all().delete()
+        User.objects.all().delete()
+
+    def generate(self, scale):
+        from accounts.models import User
+        from products.models import Category, Product
+
+        users = User.objects.bulk_create([
+            User(
+                email=f'bench{i}@example.com',
+                username=f'bench{i}',
+                password='!',
+                trust_score=Decimal(str(round(random.uniform(1, 9.99), 2)))
+            )
+            for i in range(max(2, scale // 10))
+        ], batch_size=1000)
+        categories = Category.objects.bulk_create([
+            Category(name=f'Bench {i}', slug=f'bench-{i}') for i in range(8)
+        ])
+
+        products = []
+        for i in range(scale):
+            if random.random() < 0.05:
+                latitude = longitude = None
+            else:
+                city_lat, city_lon = random.choice(CITIES)
+                latitude = Decimal(str(round(city_lat + random.gauss(0, 0.3), 6)))
+                longitude = Decimal(str(round(city_lon + random.gauss(0, 0.3), 6)))
+            products.append(Product(
+                owner=random.choice(users),
+                title=f'Bench item {i}',
+                description='Synthetic benchmark product',
+                category=random.choice(categories),
+                condition=random.choice(CONDITIONS),
+                estimated_value=Decimal(str(round(random.uniform(5, 2000), 2))),
+                latitude=latitude,
+                longitude=longitude
+            ))
+        Product.objects.bulk_create(products, batch_size=1000)
+        # bulk_create skips the signals that normally bump the snapshot version
+        bump_version()
+
+    def measure(self, func, iterations):
+        durations = []
+        queries = []
+        for _ in range(iterations):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                func()
+                durations.append(time.perf_counter() - started)
+            queries.append(len(captured))
+
+        # Tracing allocations slows every call down, so peak memory gets its own run
+        tracemalloc.start()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return {
+            **percentiles(durations),
+            'queries_max': max(queries),
+            'queries_mean': round(statistics.mean(queries), 1),
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+
+    def run_scale(self, iterations):
+        from rest_framework.test import APIClient
+        from accounts.models import User
+        from matching.engine import FairnessEngine
+        from products.models import Product
+
+        products = list(Product.objects.select_related('owner').order_by('?')[:max(iterations, 2) * 2])
+        pairs = [(products[i], products[i + 1]) for i in range(0, len(products) - 1, 2)]
+        samples = iter(products * (iterations + 1))
+        pair_samples = iter(pairs * (iterations + 1))
+
+        user = User.objects.filter(products__isnull=False).order_by('?').first()
+        client = APIClient()
+        client.force_authenticate(user)
+
+        def compatibility_view():
+            first, second = next(pair_samples)
+            client.get('/api/matching/compatibility/', {'product1': first.id, 'product2': second.id},
+                       HTTP_HOST='localhost')
+
+        benchmarks = {
+            'calculate_compatibility': lambda: FairnessEngine.calculate_compatibility(*next(pair_samples)),
+            'find_best_matches': lambda: FairnessEngine.find_best_matches(next(samples)),
+            'matches_view': lambda: client.get(f'/api/matching/products/{next(samples).id}/matches/',
+                                               HTTP_HOST='localhost'),
+            'suggested_view': lambda: client.get('/api/matching/products/suggested/', HTTP_HOST='localhost'),
+            'compatibility_view': compatibility_view,
+        }
+
+        results = {}
+        for name, func in benchmarks.items():
+            results[name] = self.measure(func, iterations)
+            self.stdout.write(
+                f"  {name}: p50 {results[name]['p50_ms']}ms, p95 {results[name]['p95_ms']}ms, "
+                f"{results[name]['queries_max']} queries"
+            )
+        return results
@@ -0,0 +1,64 @@
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from matching import parallel, store
+from matching.engine import FairnessEngine
+
+
+class Command(BaseCommand):
+    help = 'Recompute the materialized match table for every matchable product'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Number of worker processes (default: CPU count)')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Source products per chunk')
+        parser.add_argument('--output', default=None,
+                            help='Directory for chunk files; rerun with the same directory to resume')
+        parser.add_argument('--no-load', action='store_true',
+                            help='Only write chunk files, do not replace the match table')
+
+    def handle(self, *args, **options):
+        output_dir = options['output'] or tempfile.mkdtemp(prefix='rematch-')
+        # A resumed run scores the catalogue as it was when the run started
+        columns = parallel.frozen_columns(
+            output_dir, lambda: FairnessEngine.load_candidate_columns(store.matchable_products().order_by('id'))
+        )
+        self.stdout.write(f"Scoring {len(columns['ids'])} products with {options['workers']} workers into {output_dir}")
+
+        started = time.monotonic()
+        rows = 0
+
+        def progress(done, total, chunk_rows):
+            nonlocal rows
+            rows += chunk_rows
+            elapsed = time.monotonic() - started
+            self.stdout.write(f'{done}/{total} chunks, {rows} matches, {elapsed:.1f}s')
+
+        try:
+            paths = parallel.rematch(
+                columns, output_dir,
+                workers=options['workers'],
+                chunk_size=options['chunk_size'],
+                limit=store.MATCH_TABLE_SIZE,
+                min_score=store.MATCH_TABLE_MIN_SCORE,
+                progress=progress
+            )
+        except parallel.CheckpointMismatch as e:
+            raise CommandError(str(e))
+
+        if options['no_load']:
+            self.stdout.write(self.style.SUCCESS(f'Wrote {len(paths)} chunk files to {output_dir}'))
+            return
+
+        loaded = parallel.load_chunks(paths, list(columns['ids']))
+        parallel.clear_checkpoint(output_dir, paths)
+        self.stdout.write(self.style.SUCCESS(f'Loaded {loaded} matches into the match table'))
+
+        refreshed, removed = parallel.refresh_changed(columns)
+        self.stdout.write(self.style.SUCCESS(
+            f'Refreshed {refreshed} products changed and removed {removed} products gone since scoring started'
+        ))
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-17 15:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('products', '0002_productimage_video'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductMatch',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('compatibility_score', models.FloatField()),
+                ('value_similarity', models.FloatField()),
+                ('trust_factor', models.FloatField()),
+                ('condition_factor', models.IntegerField()),
+                ('proximity_factor', models.FloatField()),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('matched_product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='matched_by', to='products.product')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='matches', to='products.product')),
+            ],
+            options={
+                'ordering': ['-compatibility_score'],
+                'indexes': [models.Index(fields=['product', '-compatibility_score'], name='match_product_score_idx')],
+                'unique_together': {('product', 'matched_product')},
+            },
+        ),
+    ]
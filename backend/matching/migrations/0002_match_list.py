@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-17 15:57
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+import django.db.models.deletion
+
+
+def backfill_match_lists(apps, schema_editor):
+    ProductMatch = apps.get_model('matching', 'ProductMatch')
+    MatchList = apps.get_model('matching', 'MatchList')
+    MatchList.objects.bulk_create([
+        MatchList(product_id=row['product_id'], size=row['size'], floor=row['floor'])
+        for row in ProductMatch.objects.values('product_id').annotate(
+            size=Count('id'), floor=Min('compatibility_score')
+        ).order_by()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_filter_indexes'),
+        ('matching', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MatchList',
+            fields=[
+                ('product', models.OneToOneField(
+                    on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='match_list',
+                    serialize=False, to='products.product'
+                )),
+                ('size', models.IntegerField()),
+                ('floor', models.FloatField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['floor'], name='match_list_floor_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_match_lists, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+import uuid
+from django.db import models
+
+
+class ProductMatch(models.Model):
+    """Materialized top matches of a product, maintained by matching.store"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    product = models.ForeignKey('products.Product', on_delete=models.CASCADE, related_name='matches')
+    matched_product = models.ForeignKey('products.Product', on_delete=models.CASCADE, related_name='matched_by')
+    compatibility_score = models.FloatField()
+    value_similarity = models.FloatField()
+    trust_factor = models.FloatField()
+    condition_factor = models.IntegerField()
+    proximity_factor = models.FloatField()
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-compatibility_score']
+        unique_together = ['product', 'matched_product']
+        indexes = [
+            models.Index(fields=['product', '-compatibility_score'], name='match_product_score_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} <-> {self.matched_product_id}: {self.compatibility_score}"
+
+
+class MatchList(models.Model):
+    """
+    Size and lowest score of a product's stored ProductMatch list, so a
+    refresh can find the lists a product's new scores may enter without
+    reading every list. Maintained by matching.store along with the rows.
+    """
+    product = models.OneToOneField(
+        'products.Product', on_delete=models.CASCADE, primary_key=True, related_name='match_list'
+    )
+    size = models.IntegerField()
+    floor = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['floor'], name='match_list_floor_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}: {self.size} matches from {self.floor}"
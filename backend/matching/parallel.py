@@ -0,0 +1,296 @@
+"""
+Process-pool engine for rematching the whole catalogue.
+
+The catalogue is loaded once as candidate columns and every product is
+scored against it, in chunks of source products spread over worker
+processes. Workers never touch the database: each chunk is written to its
+own CSV file in the output directory, and those files double as the
+checkpoint, so a rerun with the same directory only scores missing chunks.
+The first run also writes the loaded columns there (COLUMNS), and a resumed
+run scores that frozen copy rather than the live catalogue, so edits made
+in between cannot mix two catalogues in one table. The manifest only
+fingerprints the scoring code and settings, so a checkpoint is never
+resumed with a changed formula. Once the chunks are loaded the checkpoint
+is deleted (clear_checkpoint), so the directory can be reused, and the
+products whose scoring inputs changed since the columns were frozen are
+refreshed on top of the loaded table (refresh_changed).
+The CSV columns match the ProductMatch table, so the files can also be
+loaded directly with Postgres COPY.
+"""
+import csv
+import hashlib
+import inspect
+import json
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+import numpy as np
+
+from .engine import FairnessEngine, UUIDColumn
+
+CSV_COLUMNS = [
+    'id', 'product_id', 'matched_product_id', 'compatibility_score', 'value_similarity',
+    'trust_factor', 'condition_factor', 'proximity_factor', 'computed_at',
+]
+MANIFEST = 'manifest.json'
+COLUMNS = 'columns.npz'
+COLUMN_KEYS = ('value', 'condition', 'latitude', 'longitude', 'trust', 'owner')
+# Everything a chunk's scores depend on besides the columns and settings
+SCORING_CODE = [
+    'batch_value_similarity', 'batch_trust_factor', 'batch_condition_factor', 'batch_haversine_distance',
+    'batch_proximity_factor', 'batch_proximity_bound', 'batch_distance_bound', 'candidate_sources',
+    'batch_partial_score', 'batch_compatibility_score', 'select_top_sources', '_top_indices',
+]
+
+_worker_columns = None
+
+
+class CheckpointMismatch(Exception):
+    pass
+
+
+def _init_worker(columns):
+    global _worker_columns
+    _worker_columns = columns
+
+
+def _chunk_path(output_dir, index):
+    return os.path.join(output_dir, f'chunk-{index:05d}.csv')
+
+
+def score_chunk(columns, start, end, limit, min_score, block_size=32):
+    """Score sources start..end of the catalogue against all of it, as CSV rows"""
+    computed_at = datetime.now(timezone.utc).isoformat()
+    rows = []
+    for block in range(start, end, block_size):
+        indices = np.arange(block, min(block + block_size, end))
+        sources = FairnessEngine.candidate_sources(columns, indices)
+        selections = FairnessEngine.select_top_sources(sources, columns, limit, min_score)
+        for source, (top, factors) in zip(indices, selections):
+            for rank, i in enumerate(top):
+                rows.append([
+                    str(uuid.uuid4()),
+                    str(columns['ids'][source]),
+                    str(columns['ids'][i]),
+                    float(factors['compatibility_score'][rank]),
+                    float(factors['value_similarity'][rank]),
+                    float(factors['trust_factor'][rank]),
+                    int(factors['condition_factor'][rank]),
+                    float(factors['proximity_factor'][rank]),
+                    computed_at,
+                ])
+    return rows
+
+
+def _run_chunk(output_dir, index, start, end, limit, min_score, columns=None):
+    rows = score_chunk(columns if columns is not None else _worker_columns, start, end, limit, min_score)
+    path = _chunk_path(output_dir, index)
+    with open(path + '.tmp', 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_COLUMNS)
+        writer.writerows(rows)
+    os.replace(path + '.tmp', path)
+    return index, len(rows)
+
+
+def _save_columns(output_dir, columns):
+    path = os.path.join(output_dir, COLUMNS)
+    owners = UUIDColumn.from_uuids(sorted(columns['owner_codes'], key=columns['owner_codes'].get))
+    # Written under a name ending in .npz, which np.savez would otherwise append
+    with open(path + '.tmp', 'wb') as f:
+        np.savez(
+            f, ids=columns['ids'].raw.view('S16'), owner_ids=owners.raw.view('S16'),
+            **{key: columns[key] for key in COLUMN_KEYS}
+        )
+    os.replace(path + '.tmp', path)
+
+
+def _load_columns(output_dir):
+    with np.load(os.path.join(output_dir, COLUMNS)) as saved:
+        columns = {key: saved[key] for key in COLUMN_KEYS}
+        columns['ids'] = UUIDColumn(saved['ids'].view('V16'))
+        owners = UUIDColumn(saved['owner_ids'].view('V16'))
+    columns['owner_codes'] = {owner_id: code for code, owner_id in enumerate(owners)}
+    return columns
+
+
+def frozen_columns(output_dir, load):
+    """
+    The candidate columns of a checkpoint in output_dir, or, when it has
+    none yet, the columns returned by `load()`, saved there for later resumes
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    if os.path.exists(os.path.join(output_dir, COLUMNS)):
+        return _load_columns(output_dir)
+    columns = load()
+    _save_columns(output_dir, columns)
+    return columns
+
+
+def _scoring_fingerprint():
+    digest = hashlib.sha1(json.dumps(FairnessEngine.CONDITION_VALUES, sort_keys=True).encode())
+    for name in SCORING_CODE:
+        digest.update(inspect.getsource(getattr(FairnessEngine, name)).encode())
+    return digest.hexdigest()
+
+
+def _write_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST)
+    if os.path.exists(path):
+        with open(path) as f:
+            existing = json.load(f)
+        if existing != manifest:
+            raise CheckpointMismatch(
+                f'{output_dir} holds a checkpoint for different scoring code or settings; '
+                'use a new output directory'
+            )
+        return
+    with open(path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+
+def rematch(columns, output_dir, workers=1, chunk_size=1000, limit=20, min_score=25, progress=None):
+    """
+    Score the whole catalogue into chunk files under output_dir. To resume,
+    pass the columns of the interrupted run, see frozen_columns.
+    `progress(done_chunks, total_chunks, rows)` is called as chunks finish.
+    Returns the chunk file paths.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    count = len(columns['ids'])
+    _write_manifest(output_dir, {
+        'products': count,
+        'scoring': _scoring_fingerprint(),
+        'chunk_size': chunk_size,
+        'limit': limit,
+        'min_score': min_score,
+    })
+
+    chunks = [(index, start, min(start + chunk_size, count)) for index, start in enumerate(range(0, count, chunk_size))]
+    pending = [chunk for chunk in chunks if not os.path.exists(_chunk_path(output_dir, chunk[0]))]
+    done = len(chunks) - len(pending)
+    if progress:
+        progress(done, len(chunks), 0)
+
+    if workers <= 1:
+        for index, start, end in pending:
+            _, rows = _run_chunk(output_dir, index, start, end, limit, min_score, columns=columns)
+            done += 1
+            if progress:
+                progress(done, len(chunks), rows)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(columns,)) as pool:
+            futures = [
+                pool.submit(_run_chunk, output_dir, index, start, end, limit, min_score)
+                for index, start, end in pending
+            ]
+            for future in as_completed(futures):
+                _, rows = future.result()
+                done += 1
+                if progress:
+                    progress(done, len(chunks), rows)
+
+    return [_chunk_path(output_dir, index) for index, _, _ in chunks]
+
+
+def clear_checkpoint(output_dir, paths):
+    """Delete a loaded checkpoint, so a later run in output_dir starts over"""
+    for path in list(paths) + [os.path.join(output_dir, MANIFEST), os.path.join(output_dir, COLUMNS)]:
+        if os.path.exists(path):
+            os.remove(path)
+    if not os.listdir(output_dir):
+        os.rmdir(output_dir)
+
+
+def _owner_column(columns):
+    """Raw owner UUID of every row"""
+    owners = UUIDColumn.from_uuids(sorted(columns['owner_codes'], key=columns['owner_codes'].get))
+    return owners.raw[columns['owner']] if len(owners) else np.zeros(len(columns['owner']), dtype='V16')
+
+
+def changed_products(frozen, current):
+    """
+    Ids of the products of `current` that are new or whose scoring inputs,
+    owner trust included, differ from `frozen`, and ids of the products of
+    `frozen` that are no longer in `current` (both candidate columns)
+    """
+    positions = frozen['ids'].positions(list(current['ids']))
+    changed = positions < 0
+    known = np.flatnonzero(~changed)
+    before = positions[known]
+    for key in ('value', 'condition', 'trust'):
+        changed[known] |= frozen[key][before] != current[key][known]
+    for key in ('latitude', 'longitude'):
+        old, new = frozen[key][before], current[key][known]
+        changed[known] |= (old != new) & ~(np.isnan(old) & np.isnan(new))
+    changed[known] |= _owner_column(frozen)[before] != _owner_column(current)[known]
+
+    gone = current['ids'].positions(list(frozen['ids'])) < 0
+    return list(current['ids'][np.flatnonzero(changed)]), list(frozen['ids'][np.flatnonzero(gone)])
+
+
+def refresh_changed(frozen, batch_size=500):
+    """
+    Bring a table loaded from `frozen` columns up to date with the live
+    catalogue, including refreshes the load overwrote: products changed
+    since are refreshed, products no longer matchable are removed.
+    Returns the number of products refreshed and removed.
+    """
+    from products.models import Product
+    from . import store
+
+    current = FairnessEngine.load_candidate_columns(store.matchable_products().order_by())
+    changed, gone = changed_products(frozen, current)
+    store.remove_products(gone)
+    for start in range(0, len(changed), batch_size):
+        store.refresh_products(
+            Product.objects.filter(id__in=changed[start:start + batch_size]).select_related('owner')
+        )
+    return len(changed), len(gone)
+
+
+def load_chunks(paths, product_ids, batch_size=5000):
+    """
+    Replace the ProductMatch table with the rows of the given chunk files,
+    which hold the lists of `product_ids`. Rows of products deleted since
+    the columns were loaded are skipped.
+    """
+    from django.db import transaction
+    from products.models import Product
+    from .models import ProductMatch
+    from .store import rebuild_match_lists
+
+    existing = {str(product_id) for product_id in Product.objects.values_list('id', flat=True)}
+
+    def read_rows():
+        for path in paths:
+            with open(path, newline='') as f:
+                for row in csv.DictReader(f):
+                    if row['product_id'] in existing and row['matched_product_id'] in existing:
+                        yield row
+
+    loaded = 0
+    with transaction.atomic():
+        ProductMatch.objects.all().delete()
+        batch = []
+        for row in read_rows():
+            batch.append(ProductMatch(
+                id=row['id'],
+                product_id=row['product_id'],
+                matched_product_id=row['matched_product_id'],
+                compatibility_score=float(row['compatibility_score']),
+                value_similarity=float(row['value_similarity']),
+                trust_factor=float(row['trust_factor']),
+                condition_factor=int(row['condition_factor']),
+                proximity_factor=float(row['proximity_factor'])
+            ))
+            if len(batch) >= batch_size:
+                ProductMatch.objects.bulk_create(batch)
+                loaded += len(batch)
+                batch = []
+        ProductMatch.objects.bulk_create(batch)
+        loaded += len(batch)
+        rebuild_match_lists([product_id for product_id in product_ids if str(product_id) in existing])
+    return loaded
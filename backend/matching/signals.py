@@ -0,0 +1,92 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from jobs.queue import enqueue, task
+from products.models import Product
+from . import store
+from .snapshot import record_change
+
+User = get_user_model()
+
+
+def _touches(update_fields, fields):
+    return update_fields is None or bool(fields & set(update_fields))
+
+
+def _scoring_inputs(product):
+    return tuple(getattr(product, column) for column in store.SCORING_COLUMNS)
+
+
+@receiver(pre_save, sender=Product)
+def remember_scoring_inputs(sender, instance, update_fields=None, raw=False, **kwargs):
+    """Remember the product's scoring inputs as stored, so a save that keeps them can be ignored"""
+    instance._previous_scoring_inputs = None
+    if raw or instance._state.adding or not _touches(update_fields, store.SCORING_FIELDS):
+        return
+    instance._previous_scoring_inputs = Product.objects.filter(pk=instance.pk).values_list(
+        *store.SCORING_COLUMNS
+    ).first()
+
+
+@receiver(post_save, sender=Product)
+def refresh_product_matches(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw or not _touches(update_fields, store.SCORING_FIELDS):
+        return
+    previous = getattr(instance, '_previous_scoring_inputs', None)
+    if not created and previous is not None and previous == _scoring_inputs(instance):
+        return
+    record_change(product_ids=[instance.id])
+    enqueue(product_changed, str(instance.id))
+
+
+@receiver(pre_delete, sender=Product)
+def remove_product_matches(sender, instance, **kwargs):
+    record_change(product_ids=[instance.id])
+    store.remove_product(instance.id)
+
+
+@receiver(pre_save, sender=User)
+def remember_trust_score(sender, instance, update_fields=None, raw=False, **kwargs):
+    instance._previous_trust_score = None
+    if raw or instance._state.adding or not _touches(update_fields, {'trust_score', 'is_active'}):
+        return
+    instance._previous_trust_score = User.objects.filter(pk=instance.pk).values_list(
+        'trust_score', 'is_active'
+    ).first()
+
+
+@receiver(post_save, sender=User)
+def refresh_owner_matches(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_trust_score', None)
+    if previous is None:
+        return
+    trust_score, is_active = previous
+    if float(trust_score) != float(instance.trust_score) or is_active != instance.is_active:
+        record_change(owner_ids=[instance.id])
+        enqueue(owner_changed, str(instance.id))
+
+
+@task
+def product_changed(product_id):
+    """Bring matching up to date after a product's scoring inputs changed"""
+    product = Product.objects.select_related('owner').filter(pk=product_id).first()
+    if product is None:
+        # Deleted since; remove_product_matches has cleaned up
+        return
+    # Recorded again so this process's snapshot has the change even
+    # where the cache, and so the version, is not shared with the request
+    record_change(product_ids=[product.id])
+    store.refresh_product(product)
+
+
+@task
+def owner_changed(user_id):
+    """
+    Bring matching up to date after a user's trust score or products changed.
+    Queued by the signals above, and by code that writes with queryset
+    updates, which send no signals; such code calls record_change() too.
+    """
+    # Recorded again for this process's snapshot, see product_changed
+    record_change(owner_ids=[user_id])
+    store.refresh_owner(user_id)
@@ -0,0 +1,145 @@
+"""
+Process-wide snapshot of the matchable catalogue as compact candidate columns.
+
+Building model instances for every candidate on every request is the main
+cost of matching, so each process keeps one read-only set of typed column
+arrays instead (see FairnessEngine.load_candidate_columns).
+
+The catalogue version in the cache is bumped once a product or trust change
+commits. record_change() stores which products and owners each version
+changed, so a process whose snapshot is a few versions behind reloads just
+those rows and patches them in; it rebuilds the whole snapshot when a
+change was not recorded (bump_version), when it is more than
+MATCHING_SNAPSHOT['PATCH_VERSIONS'] versions behind, or when the snapshot
+is older than MATCHING_SNAPSHOT['TTL'] seconds. Point the default cache at
+a shared backend so a bump reaches every worker; with the per-process
+default cache, other workers catch up within the TTL.
+"""
+import threading
+import time
+import uuid
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from .engine import FairnessEngine
+
+SNAPSHOT_VERSION_KEY = 'matching:snapshot_version'
+SNAPSHOT_CHANGE_KEY = 'matching:snapshot_change:{}'
+
+_snapshot = None
+_lock = threading.Lock()
+
+
+def _config():
+    return getattr(settings, 'MATCHING_SNAPSHOT', {})
+
+
+class CandidateSnapshot:
+    def __init__(self, columns, version, built_at=None):
+        self.columns = columns
+        self.version = version
+        self.built_at = time.monotonic() if built_at is None else built_at
+
+    @classmethod
+    def build(cls, version):
+        from .store import matchable_products
+        # Product.Meta.ordering would sort the whole catalogue for nothing
+        return cls(FairnessEngine.load_candidate_columns(matchable_products().order_by()), version)
+
+    def patch(self, version, product_ids, owner_ids):
+        """
+        A copy at `version` with the rows of the given products, and of every
+        product of the given owners, reloaded. The copy keeps this snapshot's
+        build time, so the TTL still bounds how long patches accumulate.
+        """
+        from .store import matchable_products
+
+        columns = self.columns
+        drop = np.zeros(len(columns['ids']), dtype=bool)
+        if product_ids:
+            positions = columns['ids'].positions(product_ids)
+            drop[positions[positions >= 0]] = True
+        codes = [columns['owner_codes'][owner_id] for owner_id in owner_ids if owner_id in columns['owner_codes']]
+        if codes:
+            drop |= np.isin(columns['owner'], codes)
+        fresh = FairnessEngine.load_candidate_columns(
+            matchable_products().filter(Q(id__in=product_ids) | Q(owner_id__in=owner_ids)).order_by()
+        )
+        return CandidateSnapshot(
+            FairnessEngine.patch_candidate_columns(columns, drop, fresh), version, built_at=self.built_at
+        )
+
+    def is_fresh(self, ttl):
+        return time.monotonic() - self.built_at < ttl
+
+
+def current_version():
+    return cache.get(SNAPSHOT_VERSION_KEY, 0)
+
+
+def bump_version():
+    """Mark every process's snapshot as out of date, to be rebuilt in full"""
+    try:
+        return cache.incr(SNAPSHOT_VERSION_KEY)
+    except ValueError:
+        cache.set(SNAPSHOT_VERSION_KEY, 1, None)
+        return 1
+
+
+def record_change(product_ids=(), owner_ids=()):
+    """
+    Once the current transaction commits, bump the version and record that
+    it changed the given products and all products of the given owners, so
+    snapshots can be patched rather than rebuilt.
+    """
+    change = {
+        'products': [str(product_id) for product_id in product_ids],
+        'owners': [str(owner_id) for owner_id in owner_ids],
+    }
+
+    def publish():
+        version = bump_version()
+        cache.set(SNAPSHOT_CHANGE_KEY.format(version), change, _config().get('TTL', 300))
+
+    transaction.on_commit(publish)
+
+
+def _recorded_changes(since, version):
+    """Product and owner ids changed after version `since` up to `version`, or None if any change is unknown"""
+    keys = [SNAPSHOT_CHANGE_KEY.format(number) for number in range(since + 1, version + 1)]
+    changes = cache.get_many(keys)
+    if len(changes) < len(keys):
+        return None
+    product_ids, owner_ids = set(), set()
+    for change in changes.values():
+        product_ids.update(uuid.UUID(product_id) for product_id in change['products'])
+        owner_ids.update(uuid.UUID(owner_id) for owner_id in change['owners'])
+    return list(product_ids), list(owner_ids)
+
+
+def _catch_up(snapshot, version, ttl):
+    if snapshot is not None and snapshot.is_fresh(ttl):
+        if snapshot.version == version:
+            return snapshot
+        if 0 < version - snapshot.version <= _config().get('PATCH_VERSIONS', 50):
+            changes = _recorded_changes(snapshot.version, version)
+            if changes is not None:
+                return snapshot.patch(version, *changes)
+    return CandidateSnapshot.build(version)
+
+
+def get_snapshot():
+    global _snapshot
+    ttl = _config().get('TTL', 300)
+    version = current_version()
+    snapshot = _snapshot
+    if snapshot is None or snapshot.version != version or not snapshot.is_fresh(ttl):
+        with _lock:
+            snapshot = _snapshot
+            if snapshot is None or snapshot.version != version or not snapshot.is_fresh(ttl):
+                snapshot = _snapshot = _catch_up(snapshot, version, ttl)
+    return snapshot
@@ -0,0 +1,324 @@
+"""
+Materialized match table.
+
+Every matchable product keeps its best MATCH_TABLE_SIZE matches (scoring at
+least MATCH_TABLE_MIN_SCORE) in ProductMatch. MatchList keeps each stored
+list's size and lowest score, and is updated with the rows by every function
+here. A computed list always has a MatchList row, even when it holds no
+matches (size 0); a product without one has not been computed yet and is
+filled on first read, so invalidating a list is deleting its rows and its
+MatchList row (invalidate_lists).
+"""
+from collections import Counter
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Min, Q
+
+from products.models import Product
+from .engine import FairnessEngine
+from .models import MatchList, ProductMatch
+from .snapshot import get_snapshot
+
+MATCH_TABLE_SIZE = 20
+MATCH_TABLE_MIN_SCORE = 25
+
+# Product columns that feed the engine; saves that change none of them are ignored
+SCORING_COLUMNS = ('owner_id', 'estimated_value', 'condition', 'latitude', 'longitude', 'is_active', 'is_available')
+SCORING_FIELDS = {'owner', *SCORING_COLUMNS}
+
+
+def matchable_products():
+    return Product.objects.filter(is_active=True, is_available=True, owner__is_active=True)
+
+
+def is_matchable(product):
+    return product.is_active and product.is_available and product.owner.is_active
+
+
+def _rows_from_matches(product, matches):
+    return [
+        ProductMatch(
+            product=product,
+            matched_product=match['product'],
+            compatibility_score=match['compatibility_score'],
+            value_similarity=match['value_similarity'],
+            trust_factor=match['trust_factor'],
+            condition_factor=match['condition_factor'],
+            proximity_factor=match['proximity_factor']
+        )
+        for match in matches
+    ]
+
+
+def _matches_from_rows(rows):
+    return [
+        {
+            'product': row.matched_product,
+            'compatibility_score': row.compatibility_score,
+            'value_similarity': row.value_similarity,
+            'trust_factor': row.trust_factor,
+            'condition_factor': row.condition_factor,
+            'proximity_factor': row.proximity_factor
+        }
+        for row in rows
+    ]
+
+
+def rebuild_product_matches(product):
+    """Recompute and replace the stored matches of one product"""
+    matches = FairnessEngine.find_best_matches(product, MATCH_TABLE_SIZE, MATCH_TABLE_MIN_SCORE)
+    with transaction.atomic():
+        ProductMatch.objects.filter(product=product).delete()
+        ProductMatch.objects.bulk_create(_rows_from_matches(product, matches))
+        sync_match_lists([product.id])
+    return matches
+
+
+def sync_match_lists(product_ids, batch_size=1000):
+    """
+    Recompute the MatchList rows of the given products from their stored
+    matches. Every given list is recorded as computed; one without rows
+    gets size 0.
+    """
+    product_ids = list(product_ids)
+    for start in range(0, len(product_ids), batch_size):
+        batch = product_ids[start:start + batch_size]
+        aggregates = {
+            row['product_id']: (row['size'], row['floor'])
+            for row in ProductMatch.objects.filter(product_id__in=batch).values('product_id').annotate(
+                size=Count('id'), floor=Min('compatibility_score')
+            ).order_by()
+        }
+        lists = []
+        for product_id in batch:
+            size, floor = aggregates.get(product_id, (0, 0))
+            lists.append(MatchList(product_id=product_id, size=size, floor=floor))
+        MatchList.objects.filter(product_id__in=batch).delete()
+        MatchList.objects.bulk_create(lists)
+
+
+def invalidate_lists(product_ids):
+    """Mark the lists of the given products as not computed, to be rebuilt on next read"""
+    product_ids = list(product_ids)
+    ProductMatch.objects.filter(product_id__in=product_ids).delete()
+    MatchList.objects.filter(product_id__in=product_ids).delete()
+
+
+def rebuild_match_lists(product_ids):
+    """
+    Recompute every MatchList row, e.g. after the match table was reloaded;
+    `product_ids` are the products whose lists the table now holds
+    """
+    with transaction.atomic():
+        MatchList.objects.all().delete()
+        sync_match_lists(product_ids)
+
+
+def is_computed(product_id):
+    return MatchList.objects.filter(product_id=product_id).exists()
+
+
+def get_matches(product, limit=10, min_score=30):
+    """
+    Read a product's best matches from the match table, in the same shape as
+    FairnessEngine.find_best_matches. Falls back to live scoring when the
+    request is outside what the table holds.
+    """
+    if limit > MATCH_TABLE_SIZE or min_score < MATCH_TABLE_MIN_SCORE or not is_matchable(product):
+        return FairnessEngine.find_best_matches(product, limit, min_score)
+
+    rows = list(
+        ProductMatch.objects.filter(
+            product=product,
+            matched_product__is_active=True,
+            matched_product__is_available=True
+        ).select_related(
+            'matched_product__owner', 'matched_product__category'
+        ).prefetch_related(
+            'matched_product__images', 'matched_product__owner__badges'
+        ).order_by('-compatibility_score')[:limit]
+    )
+    if rows or is_computed(product.id):
+        matches = _matches_from_rows(rows)
+    else:
+        matches = rebuild_product_matches(product)[:limit]
+
+    return [match for match in matches if match['compatibility_score'] >= min_score]
+
+
+def get_matches_for_products(products, limit=10, min_score=30):
+    """
+    Read the best matches of several products with one query. Products whose
+    lists are not computed yet (no MatchList row) are scored together in one
+    batch and stored.
+    Returns a dict of product id -> matches.
+    """
+    products = list(products)
+    if limit > MATCH_TABLE_SIZE or min_score < MATCH_TABLE_MIN_SCORE:
+        return FairnessEngine.find_best_matches_for_products(products, limit, min_score)
+
+    stored = {product.id: [] for product in products if is_matchable(product)}
+    rows = ProductMatch.objects.filter(
+        product_id__in=list(stored),
+        matched_product__is_active=True,
+        matched_product__is_available=True
+    ).select_related(
+        'matched_product__owner', 'matched_product__category'
+    ).prefetch_related(
+        'matched_product__images', 'matched_product__owner__badges'
+    ).order_by('product_id', '-compatibility_score')
+    for row in rows:
+        stored[row.product_id].append(row)
+    computed_ids = set(MatchList.objects.filter(product_id__in=list(stored)).values_list('product_id', flat=True))
+
+    missing = [product for product in products if product.id not in computed_ids]
+    computed = {}
+    if missing:
+        computed = FairnessEngine.find_best_matches_for_products(missing, MATCH_TABLE_SIZE, MATCH_TABLE_MIN_SCORE)
+        with transaction.atomic():
+            to_store = [product for product in missing if product.id in stored]
+            ProductMatch.objects.filter(product__in=to_store).delete()
+            ProductMatch.objects.bulk_create([
+                row for product in to_store for row in _rows_from_matches(product, computed[product.id])
+            ])
+            sync_match_lists([product.id for product in to_store])
+
+    results = {}
+    for product in products:
+        if product.id in computed_ids:
+            matches = _matches_from_rows(stored[product.id][:limit])
+        else:
+            matches = computed[product.id][:limit]
+        results[product.id] = [match for match in matches if match['compatibility_score'] >= min_score]
+    return results
+
+
+def remove_product(product_id):
+    """Drop a product from the match table, see remove_products"""
+    remove_products([product_id])
+
+
+def remove_products(product_ids):
+    """
+    Drop products from the match table. Lists that were full may now be
+    missing their next-best matches, so they are invalidated and recomputed
+    on next read.
+    """
+    product_ids = list(product_ids)
+    with transaction.atomic():
+        referencing = set(
+            ProductMatch.objects.filter(matched_product_id__in=product_ids).values_list('product_id', flat=True)
+        ) - set(product_ids)
+        full = list(MatchList.objects.filter(
+            product_id__in=list(referencing), size__gte=MATCH_TABLE_SIZE
+        ).values_list('product_id', flat=True))
+        ProductMatch.objects.filter(matched_product_id__in=product_ids).delete()
+        counts = dict(ProductMatch.objects.filter(product_id__in=full).values('product_id').annotate(
+            count=Count('id')
+        ).order_by().values_list('product_id', 'count'))
+        short = [product_id for product_id in full if counts.get(product_id, 0) < MATCH_TABLE_SIZE]
+        invalidate_lists(short + product_ids)
+        sync_match_lists(referencing - set(short))
+
+
+def refresh_product(product):
+    """Bring the match table up to date after a product's scoring inputs changed, see refresh_products"""
+    refresh_products([product])
+
+
+def refresh_owner(user_id):
+    """Refresh every product of a user, e.g. after their trust score changed"""
+    refresh_products(Product.objects.filter(owner_id=user_id).select_related('owner'))
+
+
+def refresh_products(products, block_size=32):
+    """
+    Bring the match table up to date after the scoring inputs of several
+    products changed, in one transaction: their own lists are rebuilt in one
+    batch, and their new scores are merged into the other lists they now
+    belong in.
+
+    Scores are symmetric, so the best score a product gets from any other
+    product's side is the top of its own new list. Only the lists the
+    products were in, and lists that are not full or whose lowest score is
+    below the best of those scores (MatchList), are read; they are scored
+    against `block_size` products per matrix pass over the catalogue
+    snapshot. A full list stays valid only while it keeps at least
+    MATCH_TABLE_SIZE rows above everything it left out; otherwise it is
+    invalidated, as are lists grown to twice that size (lists are trimmed
+    lazily).
+    """
+    products = list(products)
+    removed = [product.id for product in products if not is_matchable(product)]
+    products = [product for product in products if is_matchable(product)]
+    if removed:
+        remove_products(removed)
+    if not products:
+        return
+
+    columns = get_snapshot().columns
+    own = FairnessEngine.find_best_matches_for_products(products, MATCH_TABLE_SIZE, MATCH_TABLE_MIN_SCORE)
+    best = max((matches[0]['compatibility_score'] for matches in own.values() if matches), default=None)
+    source_ids = [product.id for product in products]
+
+    with transaction.atomic():
+        ProductMatch.objects.filter(product_id__in=source_ids).delete()
+        ProductMatch.objects.bulk_create([
+            row for product in products for row in _rows_from_matches(product, own[product.id])
+        ], batch_size=1000)
+
+        previous = ProductMatch.objects.filter(matched_product_id__in=source_ids).exclude(product_id__in=source_ids)
+        lost = Counter(previous.values_list('product_id', flat=True))
+        previous.delete()
+
+        query = Q(product_id__in=list(lost))
+        if best is not None:
+            query |= Q(size__lt=MATCH_TABLE_SIZE) | Q(floor__lt=best)
+        lists = {
+            product_id: (size, floor)
+            for product_id, size, floor in MatchList.objects.filter(query).exclude(
+                product_id__in=source_ids
+            ).values_list('product_id', 'size', 'floor')
+        }
+
+        other_ids = list(lists)
+        positions = columns['ids'].positions(other_ids)
+        present = np.flatnonzero(positions >= 0)
+        entering = {other_id: [] for other_id in other_ids}
+        for start in range(0, len(products) if len(present) else 0, block_size):
+            block = products[start:start + block_size]
+            scores, factors = FairnessEngine.score_many(block, columns, positions[present])
+            for row, column in zip(*np.nonzero(scores >= MATCH_TABLE_MIN_SCORE)):
+                other_id = other_ids[present[column]]
+                entering[other_id].append(ProductMatch(
+                    product_id=other_id,
+                    matched_product_id=block[row].id,
+                    compatibility_score=float(scores[row, column]),
+                    value_similarity=float(factors['value_similarity'][row, column]),
+                    trust_factor=float(factors['trust_factor'][row, column]),
+                    condition_factor=int(factors['condition_factor'][row, column]),
+                    proximity_factor=float(factors['proximity_factor'][row, column])
+                ))
+
+        # Rows were deleted from lists without a MatchList row, which are not computed anyway
+        stale = [product_id for product_id in lost if product_id not in lists]
+        inserts = []
+        for other_id, (size, floor) in lists.items():
+            rows = entering[other_id]
+            if size >= MATCH_TABLE_SIZE:
+                # Products left out of a full list score at most its lowest score
+                rows = [row for row in rows if row.compatibility_score > floor]
+                if size - lost[other_id] + len(rows) < MATCH_TABLE_SIZE:
+                    stale.append(other_id)
+                    continue
+            if size - lost[other_id] + len(rows) >= 2 * MATCH_TABLE_SIZE:
+                stale.append(other_id)
+                continue
+            inserts.extend(rows)
+
+        invalidate_lists(stale)
+        ProductMatch.objects.bulk_create(inserts, batch_size=1000)
+        sync_match_lists(
+            set(source_ids) | ((set(lost) | {row.product_id for row in inserts}) - set(stale))
+        )
@@ -1,9 +1,13 @@
+import uuid
+
+from django.core.exceptions import ValidationError
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from products.models import Product
 from products.serializers import ProductListSerializer
+from . import store
 from .engine import FairnessEngine
 
 
@@ -13,14 +17,21 @@ class MatchingViewSet(viewsets.GenericViewSet):
     @action(detail=True, methods=['get'], url_path='matches')
     def get_matches(self, request, pk=None):
         try:
-            product = Product.objects.get(id=pk, is_active=True)
+            product = Product.objects.select_related('owner', 'category').prefetch_related(
+                'images', 'owner__badges'
+            ).get(id=pk, is_active=True)
         except Product.DoesNotExist:
             return Response({'error': 'Product not found'}, status=status.HTTP_404_NOT_FOUND)
         
-        limit = int(request.query_params.get('limit', 10))
-        min_score = float(request.query_params.get('min_score', 30))
+        try:
+            limit = int(request.query_params.get('limit', 10))
+            min_score = float(request.query_params.get('min_score', 30))
+        except ValueError:
+            return Response({'error': 'limit and min_score must be numbers'}, status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1:
+            return Response({'error': 'limit must be positive'}, status=status.HTTP_400_BAD_REQUEST)
         
-        matches = FairnessEngine.find_best_matches(product, limit, min_score)
+        matches = store.get_matches(product, limit, min_score)
         
         results = []
         for match in matches:
@@ -53,7 +64,7 @@ class MatchingViewSet(viewsets.GenericViewSet):
             owner=user,
             is_active=True,
             is_available=True
-        ).select_related('owner', 'category')
+        ).select_related('owner', 'category').prefetch_related('images', 'owner__badges')
         
         if not user_products.exists():
             return Response({
@@ -61,21 +72,31 @@ class MatchingViewSet(viewsets.GenericViewSet):
                 'matches': []
             })
         
-        all_matches = []
-        
-        for user_product in user_products:
-            matches = FairnessEngine.find_best_matches(user_product, limit=5, min_score=25)
-            for match in matches:
-                all_matches.append({
-                    'your_product': ProductListSerializer(user_product, context={'request': request}).data,
-                    'matched_product': ProductListSerializer(match['product'], context={'request': request}).data,
-                    'compatibility_score': match['compatibility_score']
-                })
-        
-        all_matches.sort(key=lambda x: x['compatibility_score'], reverse=True)
+        matches_by_product = store.get_matches_for_products(user_products, limit=5, min_score=25)
+
+        serialized = {}
+
+        def serialize(product):
+            if product.id not in serialized:
+                serialized[product.id] = ProductListSerializer(product, context={'request': request}).data
+            return serialized[product.id]
+
+        all_matches = [
+            (user_product, match)
+            for user_product in user_products
+            for match in matches_by_product[user_product.id]
+        ]
+        all_matches.sort(key=lambda x: x[1]['compatibility_score'], reverse=True)
         
         return Response({
-            'matches': all_matches[:20],
+            'matches': [
+                {
+                    'your_product': serialize(user_product),
+                    'matched_product': serialize(match['product']),
+                    'compatibility_score': match['compatibility_score']
+                }
+                for user_product, match in all_matches[:20]
+            ],
             'total_matches': len(all_matches)
         })
 
@@ -93,48 +114,40 @@ class CompatibilityView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        # Both products in one query, and one per prefetch, rather than one set per product
         try:
-            product1 = Product.objects.get(id=product1_id, is_active=True)
-            product2 = Product.objects.get(id=product2_id, is_active=True)
-        except Product.DoesNotExist:
+            products = Product.objects.filter(is_active=True).select_related('owner', 'category').prefetch_related(
+                'images', 'owner__badges'
+            ).in_bulk([product1_id, product2_id])
+            product1 = products[uuid.UUID(product1_id)]
+            product2 = products[uuid.UUID(product2_id)]
+        except (KeyError, ValueError, ValidationError):
             return Response(
                 {'error': 'Product not found'},
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        score = FairnessEngine.calculate_compatibility(product1, product2)
+        breakdown = FairnessEngine.compatibility_breakdown(product1, product2)
         
         return Response({
             'product1': ProductListSerializer(product1, context={'request': request}).data,
             'product2': ProductListSerializer(product2, context={'request': request}).data,
-            'compatibility_score': score,
+            'compatibility_score': breakdown['compatibility_score'],
             'breakdown': {
                 'value_similarity': {
-                    'score': round(FairnessEngine.calculate_value_similarity(
-                        float(product1.estimated_value),
-                        float(product2.estimated_value)
-                    ), 2),
+                    'score': round(breakdown['value_similarity'], 2),
                     'weight': '35%'
                 },
                 'trust_factor': {
-                    'score': round(FairnessEngine.calculate_trust_factor(
-                        product1.owner.trust_score,
-                        product2.owner.trust_score
-                    ), 2),
+                    'score': round(breakdown['trust_factor'], 2),
                     'weight': '25%'
                 },
                 'condition_factor': {
-                    'score': FairnessEngine.calculate_condition_factor(
-                        product1.condition,
-                        product2.condition
-                    ),
+                    'score': breakdown['condition_factor'],
                     'weight': '20%'
                 },
                 'proximity_factor': {
-                    'score': round(FairnessEngine.calculate_proximity_factor(
-                        product1.latitude, product1.longitude,
-                        product2.latitude, product2.longitude
-                    ), 2),
+                    'score': round(breakdown['proximity_factor'], 2),
                     'weight': '20%'
                 }
             }
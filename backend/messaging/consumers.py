@@ -0,0 +1,51 @@
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from channels.middleware import BaseMiddleware
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .events import group_name
+
+User = get_user_model()
+
+
+@database_sync_to_async
+def user_for_token(token):
+    try:
+        user_id = AccessToken(token)['user_id']
+    except (TokenError, KeyError):
+        return AnonymousUser()
+    return User.objects.filter(id=user_id, is_active=True).first() or AnonymousUser()
+
+
+class JWTQueryAuthMiddleware(BaseMiddleware):
+    """Authenticate WebSocket connections from an access token in ?token="""
+
+    async def __call__(self, scope, receive, send):
+        token = parse_qs(scope.get('query_string', b'').decode()).get('token', [None])[0]
+        scope['user'] = await user_for_token(token) if token else AnonymousUser()
+        return await super().__call__(scope, receive, send)
+
+
+class EventsConsumer(AsyncJsonWebsocketConsumer):
+    """Pushes the user's messaging and notification events as JSON frames"""
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+        self.group = group_name(user.id)
+        await self.channel_layer.group_add(self.group, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if hasattr(self, 'group'):
+            await self.channel_layer.group_discard(self.group, self.channel_name)
+
+    async def event_push(self, message):
+        await self.send_json(message['event'])
@@ -0,0 +1,123 @@
+"""
+Per-user event stream for messaging and notifications.
+
+Every event gets a per-user sequence number and is kept in the Django cache
+for MESSAGING_EVENTS['TTL'] seconds, which is what the long-poll endpoint
+reads. When Django Channels is installed, events are also pushed to the
+user's channel group so WebSocket clients get them immediately. Events are
+published when the surrounding transaction commits, so clients never hear
+about rows they cannot read yet.
+
+The cache must be shared between processes for long-polling to work across
+workers (REDIS_URL in production). With a process-local cache (the default
+local-memory cache) a poller would never see events published by another
+worker or serverless instance, so the long-poll endpoint is refused then
+(is_shared) and clients poll a conversation's messages with ?since=.
+
+Event types:
+    message.created    a message was sent in one of the user's conversations
+    message.read       messages the user sent were delivered to a participant
+    notification.created
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+try:
+    from asgiref.sync import async_to_sync
+    from channels.layers import get_channel_layer
+except ImportError:  # WebSocket push is optional; long-polling works without it
+    get_channel_layer = None
+
+
+# Cache backends whose entries only the process that wrote them can read
+PROCESS_LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+def _config():
+    return getattr(settings, 'MESSAGING_EVENTS', {})
+
+
+def is_shared():
+    """Whether events stored by one process can be read by every other one"""
+    return settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHES
+
+
+def _sequence_key(user_id):
+    return f'messaging:events:{user_id}:seq'
+
+
+def _event_key(user_id, sequence):
+    return f'messaging:events:{user_id}:{sequence}'
+
+
+def group_name(user_id):
+    return f'user.{user_id}'
+
+
+def current_cursor(user_id):
+    return cache.get(_sequence_key(user_id)) or 0
+
+
+def _append(user_id, event):
+    key = _sequence_key(user_id)
+    cache.add(key, 0, None)
+    sequence = cache.incr(key)
+    event = dict(event, cursor=sequence)
+    cache.set(_event_key(user_id, sequence), event, _config().get('TTL', 300))
+    return event
+
+
+def _deliver(user_ids, event):
+    layer = get_channel_layer() if get_channel_layer is not None else None
+    for user_id in set(user_ids):
+        stored = _append(user_id, event)
+        if layer is not None:
+            async_to_sync(layer.group_send)(group_name(user_id), {'type': 'event.push', 'event': stored})
+
+
+def publish(user_ids, event_type, data):
+    """Send an event to each of the given users once the current transaction commits"""
+    event = {'type': event_type, 'data': data}
+    user_ids = [str(user_id) for user_id in user_ids]
+    transaction.on_commit(lambda: _deliver(user_ids, event))
+
+
+def events_since(user_id, cursor):
+    """
+    Events for the user after `cursor`, oldest first, and the cursor to poll
+    with next. Events that expired from the cache are skipped.
+    """
+    latest = current_cursor(user_id)
+    if cursor > latest:
+        # The sequence was lost (cache flush); start over from the beginning
+        cursor = 0
+    first = max(cursor + 1, latest - _config().get('MAX_BATCH', 100) + 1)
+    keys = [_event_key(user_id, sequence) for sequence in range(first, latest + 1)]
+    found = cache.get_many(keys) if keys else {}
+    return latest, [found[key] for key in keys if key in found]
+
+
+def message_payload(message):
+    return {
+        'id': str(message.id),
+        'conversation': str(message.conversation_id),
+        'sender': str(message.sender_id),
+        'content': message.content,
+        'is_read': message.is_read,
+        'created_at': message.created_at.isoformat(),
+    }
+
+
+def notification_payload(notification):
+    return {
+        'id': str(notification.id),
+        'type': notification.type,
+        'title': notification.title,
+        'message': notification.message,
+        'is_read': notification.is_read,
+        'created_at': notification.created_at.isoformat(),
+    }
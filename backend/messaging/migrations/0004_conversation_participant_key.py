@@ -0,0 +1,40 @@
+# Generated by Django 4.2.30 on 2026-10-17 15:37
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def backfill_participant_keys(apps, schema_editor):
+    Conversation = apps.get_model('messaging', 'Conversation')
+    participants = defaultdict(list)
+    for conversation_id, user_id in Conversation.participants.through.objects.values_list(
+        'conversation_id', 'user_id'
+    ):
+        participants[conversation_id].append(str(user_id))
+
+    # Of duplicate conversations between the same pair, the most recently
+    # active one gets the key; the others keep a null key
+    keyed = {}
+    for conversation_id in Conversation.objects.order_by('updated_at').values_list('id', flat=True):
+        users = participants.get(conversation_id, [])
+        if len(set(users)) == 2:
+            keyed[':'.join(sorted(set(users)))] = conversation_id
+    conversations = [Conversation(id=conversation_id, participant_key=key) for key, conversation_id in keyed.items()]
+    Conversation.objects.bulk_update(conversations, ['participant_key'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0003_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='participant_key',
+            field=models.CharField(blank=True, editable=False, max_length=73, null=True, unique=True),
+        ),
+        migrations.RunPython(backfill_participant_keys, migrations.RunPython.noop),
+    ]
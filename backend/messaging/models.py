@@ -3,9 +3,16 @@ from django.db import models
 from django.conf import settings
 
 
+def participant_key(user_a, user_b):
+    """Canonical key of a two-party conversation: the sorted pair of user ids"""
+    return ':'.join(sorted(str(getattr(user, 'pk', user)) for user in (user_a, user_b)))
+
+
 class Conversation(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     participants = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='conversations')
+    # participant_key() of a two-party conversation, so there is at most one per pair
+    participant_key = models.CharField(max_length=73, unique=True, null=True, blank=True, editable=False)
     swap_request = models.ForeignKey('swaps.SwapRequest', on_delete=models.SET_NULL, null=True, blank=True, related_name='conversations')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -29,6 +36,14 @@ class Message(models.Model):
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['conversation', 'created_at'], name='message_conv_created_idx'),
+            models.Index(
+                fields=['conversation', 'sender'],
+                condition=models.Q(is_read=False),
+                name='message_unread_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"Message from {self.sender.email}"
@@ -24,12 +24,28 @@ class ConversationSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
 
     def get_last_message(self, obj):
+        if hasattr(obj, 'last_message_id'):
+            if obj.last_message_id is None:
+                return None
+            # The sender is always a participant, and those are already loaded
+            sender = next((user for user in obj.participants.all() if user.id == obj.last_message_sender_id), None)
+            if sender is not None:
+                return MessageSerializer(Message(
+                    id=obj.last_message_id,
+                    conversation=obj,
+                    sender=sender,
+                    content=obj.last_message_content,
+                    is_read=obj.last_message_is_read,
+                    created_at=obj.last_message_created_at
+                )).data
         last_msg = obj.messages.last()
         if last_msg:
             return MessageSerializer(last_msg).data
         return None
 
     def get_unread_count(self, obj):
+        if hasattr(obj, 'unread_messages'):
+            return obj.unread_messages
         user = self.context.get('request').user if self.context.get('request') else None
         if user:
             return obj.messages.exclude(sender=user).filter(is_read=False).count()
@@ -37,6 +53,8 @@ class ConversationSerializer(serializers.ModelSerializer):
 
     def get_starred_by(self, obj):
         user = self.context.get('request').user if self.context.get('request') else None
+        if user and hasattr(obj, 'is_starred'):
+            return [user.id] if obj.is_starred else []
         if user and user in obj.starred_by.all():
             return [user.id]
         return []
@@ -0,0 +1,21 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from accounts.models import Notification
+from .events import message_payload, notification_payload, publish
+from .models import Message
+
+
+@receiver(post_save, sender=Message)
+def publish_message(sender, instance, created, raw=False, **kwargs):
+    if raw or not created:
+        return
+    participants = instance.conversation.participants.values_list('id', flat=True)
+    publish(participants, 'message.created', message_payload(instance))
+
+
+@receiver(post_save, sender=Notification)
+def publish_notification(sender, instance, created, raw=False, **kwargs):
+    if raw or not created:
+        return
+    publish([instance.user_id], 'notification.created', notification_payload(instance))
@@ -1,11 +1,46 @@
+import time
+
+from django.conf import settings
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Q
-from .models import Conversation, Message
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, IntegerField, OuterRef, Q, Subquery, UUIDField
+from django.db.models.functions import Coalesce
+from .events import current_cursor, events_since, is_shared, publish
+from .models import Conversation, Message, participant_key
 from .serializers import ConversationSerializer, MessageSerializer, ConversationCreateSerializer
 
 
+MESSAGE_PAGE_SIZE = 50
+MAX_MESSAGE_PAGE_SIZE = 200
+
+
+def unread_messages(user):
+    """Per-conversation count of messages the user has not read, as a subquery"""
+    counts = Message.objects.filter(
+        conversation=OuterRef('pk'), is_read=False
+    ).exclude(sender=user).order_by().values('conversation').annotate(count=Count('id')).values('count')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def last_message_fields():
+    """Annotations holding each conversation's latest message, read by ConversationSerializer"""
+    latest = Message.objects.filter(conversation=OuterRef('pk')).order_by('-created_at', '-id')
+    annotations = {
+        f'last_message_{field}': Subquery(latest.values(field)[:1])
+        for field in ('id', 'content', 'is_read', 'created_at')
+    }
+    # A foreign key column would otherwise come back unconverted on SQLite
+    annotations['last_message_sender_id'] = Subquery(latest.values('sender_id')[:1], output_field=UUIDField())
+    return annotations
+
+
+def starred(user):
+    return Exists(Conversation.starred_by.through.objects.filter(conversation=OuterRef('pk'), user=user))
+
+
 class ConversationViewSet(viewsets.ModelViewSet):
     serializer_class = ConversationSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -17,7 +52,11 @@ class ConversationViewSet(viewsets.ModelViewSet):
                 participants=self.request.user
             ).exclude(
                 deleted_by=self.request.user
-            ).prefetch_related('participants', 'messages', 'starred_by')
+            ).annotate(
+                unread_messages=unread_messages(self.request.user),
+                is_starred=starred(self.request.user),
+                **last_message_fields()
+            ).prefetch_related('participants__badges')
         except Exception:
             return Conversation.objects.filter(
                 participants=self.request.user
@@ -29,17 +68,114 @@ class ConversationViewSet(viewsets.ModelViewSet):
         return ConversationSerializer
 
     def perform_create(self, serializer):
+        participants = {user.pk for user in serializer.validated_data.get('participants', [])}
+        participants.add(self.request.user.pk)
+        if len(participants) == 2:
+            serializer.instance, _ = get_or_create_conversation(
+                *participants, swap_request=serializer.validated_data.get('swap_request')
+            )
+            return
         conversation = serializer.save()
         conversation.participants.add(self.request.user)
 
     @action(detail=True, methods=['get'], url_path='messages')
     def messages(self, request, pk=None):
+        """
+        Messages of the conversation, oldest first: the whole history, or
+        with any of these parameters a page of at most ?limit=<n>:
+        ?before=<message id> the latest messages older than that message,
+        ?since=<message id> the first messages after that message (delta polling;
+        pass the id of the newest message received),
+        otherwise the latest messages.
+        Only the messages returned are marked as read.
+        """
         conversation = self.get_object()
-        messages = conversation.messages.all()
-        conversation.messages.exclude(sender=request.user).update(is_read=True)
-        serializer = MessageSerializer(messages, many=True)
+        messages = conversation.messages.select_related('sender').prefetch_related('sender__badges')
+
+        limit = None
+        if {'before', 'since', 'limit'} & set(request.query_params):
+            try:
+                limit = min(int(request.query_params.get('limit', MESSAGE_PAGE_SIZE)), MAX_MESSAGE_PAGE_SIZE)
+            except ValueError:
+                return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+            if limit < 1:
+                return Response({'error': 'limit must be positive'}, status=status.HTTP_400_BAD_REQUEST)
+
+        before = request.query_params.get('before')
+        if before:
+            try:
+                anchor = conversation.messages.filter(id=before).values_list('created_at', flat=True).first()
+            except ValidationError:
+                anchor = None
+            if anchor is None:
+                return Response({'error': 'Unknown message'}, status=status.HTTP_400_BAD_REQUEST)
+            messages = messages.filter(Q(created_at__lt=anchor) | Q(created_at=anchor, id__lt=before))
+
+        since = request.query_params.get('since')
+        if since:
+            try:
+                anchor = conversation.messages.filter(id=since).values_list('created_at', flat=True).first()
+            except ValidationError:
+                anchor = None
+            if anchor is None:
+                return Response({'error': 'Unknown message'}, status=status.HTTP_400_BAD_REQUEST)
+            messages = messages.filter(Q(created_at__gt=anchor) | Q(created_at=anchor, id__gt=since))
+            page = list(messages.order_by('created_at', 'id')[:limit])
+        elif limit is None:
+            page = list(messages.order_by('created_at', 'id'))
+        else:
+            page = list(messages.order_by('-created_at', '-id')[:limit])[::-1]
+
+        delivered = [message for message in page if not message.is_read and message.sender_id != request.user.id]
+        if delivered:
+            Message.objects.filter(id__in=[message.id for message in delivered]).update(is_read=True)
+            read_by_sender = {}
+            for message in delivered:
+                message.is_read = True
+                read_by_sender.setdefault(message.sender_id, []).append(str(message.id))
+            for sender_id, message_ids in read_by_sender.items():
+                publish([sender_id], 'message.read', {
+                    'conversation': str(conversation.id),
+                    'reader': str(request.user.id),
+                    'messages': message_ids,
+                })
+
+        serializer = MessageSerializer(page, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'], url_path='events')
+    def events(self, request):
+        """
+        Long-poll for the user's events, for clients without WebSockets.
+        Call without ?cursor= to get the current cursor, then with it to wait up
+        to ?timeout= seconds for anything newer. Each waiting poll holds a
+        worker thread for that long.
+        Refused when the cache is process-local, as events published by other
+        processes would never arrive; poll messages with ?since= instead.
+        """
+        if not is_shared():
+            return Response(
+                {'error': 'The event stream needs a cache shared between processes (REDIS_URL); '
+                          'poll conversation messages with ?since= instead'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        config = getattr(settings, 'MESSAGING_EVENTS', {})
+        user_id = str(request.user.id)
+        if 'cursor' not in request.query_params:
+            return Response({'cursor': current_cursor(user_id), 'events': []})
+        try:
+            cursor = int(request.query_params['cursor'])
+            timeout = float(request.query_params.get('timeout', config.get('LONG_POLL_TIMEOUT', 25)))
+        except ValueError:
+            return Response({'error': 'cursor and timeout must be numbers'}, status=status.HTTP_400_BAD_REQUEST)
+
+        deadline = time.monotonic() + max(0.0, min(timeout, config.get('LONG_POLL_TIMEOUT', 25)))
+        while True:
+            latest, pending = events_since(user_id, cursor)
+            if pending or latest < cursor or time.monotonic() >= deadline:
+                return Response({'cursor': latest, 'events': pending})
+            time.sleep(config.get('POLL_INTERVAL', 1.0))
+
     @action(detail=True, methods=['post'], url_path='send')
     def send(self, request, pk=None):
         conversation = self.get_object()
@@ -75,15 +211,36 @@ class ConversationViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'], url_path='unread-count')
     def unread_count(self, request):
-        total_unread = 0
-        for conv in Conversation.objects.filter(participants=request.user).prefetch_related('messages'):
-            total_unread += conv.messages.exclude(sender=request.user).filter(is_read=False).count()
+        total_unread = Message.objects.filter(
+            conversation__participants=request.user, is_read=False
+        ).exclude(sender=request.user).count()
         return Response({'unread_count': total_unread})
 
 
+def get_or_create_conversation(user_a, user_b, swap_request=None):
+    """
+    The conversation between two users, created if they have none yet; a
+    single lookup on the unique participant_key. A conversation either user
+    had deleted reappears for them, linked to `swap_request` if given.
+    """
+    key = participant_key(user_a, user_b)
+    conversation = Conversation.objects.filter(participant_key=key).first()
+    if conversation is None:
+        try:
+            with transaction.atomic():
+                conversation = Conversation.objects.create(participant_key=key, swap_request=swap_request)
+                conversation.participants.add(user_a, user_b)
+            return conversation, True
+        except IntegrityError:
+            # Created concurrently for the same pair
+            conversation = Conversation.objects.get(participant_key=key)
+    if swap_request is not None and conversation.swap_request_id != swap_request.pk:
+        conversation.swap_request = swap_request
+        conversation.save(update_fields=['swap_request', 'updated_at'])
+    conversation.deleted_by.remove(user_a, user_b)
+    return conversation, False
+
+
 def create_conversation_for_swap(swap):
-    from swaps.models import SwapRequest
-    
-    conversation = Conversation.objects.create(swap_request=swap)
-    conversation.participants.add(swap.sender, swap.receiver)
+    conversation, _ = get_or_create_conversation(swap.sender_id, swap.receiver_id, swap_request=swap)
     return conversation
@@ -0,0 +1,12 @@
+from rest_framework.pagination import CursorPagination
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """
+    Keyset pagination, newest first. Pages are fetched with a WHERE on
+    created_at instead of an OFFSET, and no COUNT(*) is run, so a deep page
+    costs the same as the first. id breaks ties between equal timestamps.
+    """
+    ordering = ('-created_at', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
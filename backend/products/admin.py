@@ -4,7 +4,7 @@ from .models import Category, ProductImage, Product
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ['name', 'slug', 'icon', 'created_at']
+    list_display = ['name', 'slug', 'icon', 'product_count', 'created_at']
     prepopulated_fields = {'slug': ('name',)}
     search_fields = ['name']
 
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from products.models import Category, Product
+
+
+class Command(BaseCommand):
+    help = 'Recount the available products of every category and fix any drift in product_count'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report categories whose counter has drifted')
+
+    def handle(self, *args, **options):
+        drifted = Category.objects.annotate(
+            listed=Count('products', filter=Q(products__is_active=True, products__is_available=True))
+        ).exclude(product_count=F('listed'))
+        for category in drifted:
+            self.stdout.write(f'{category.slug}: {category.product_count} -> {category.listed}')
+
+        if options['dry_run']:
+            return
+
+        # One UPDATE with a correlated count, so concurrent F() increments are not lost
+        listed = Product.objects.filter(
+            category=OuterRef('pk'), is_active=True, is_available=True
+        ).order_by().values('category').annotate(count=Count('id')).values('count')
+        updated = Category.objects.update(
+            product_count=Coalesce(Subquery(listed, output_field=IntegerField()), 0)
+        )
+        self.stdout.write(self.style.SUCCESS(f'Recounted {updated} categories'))
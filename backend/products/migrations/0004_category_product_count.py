@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-17 15:16
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_product_counts(apps, schema_editor):
+    Category = apps.get_model('products', 'Category')
+    categories = list(Category.objects.annotate(
+        listed=Count('products', filter=Q(products__is_active=True, products__is_available=True))
+    ))
+    for category in categories:
+        category.product_count = category.listed
+    Category.objects.bulk_update(categories, ['product_count'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_productimage_video'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='product_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_product_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,85 @@
+from django.db import migrations
+
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE products_product ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    'CREATE INDEX product_search_vector_idx ON products_product USING GIN (search_vector)',
+]
+POSTGRES_REVERSE = [
+    'DROP INDEX IF EXISTS product_search_vector_idx',
+    'ALTER TABLE products_product DROP COLUMN IF EXISTS search_vector',
+]
+
+# product_id holds the product's primary key as stored by SQLite (32-char hex)
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE products_search USING fts5(
+        product_id UNINDEXED, title, description, tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    INSERT INTO products_search (product_id, title, description)
+    SELECT id, title, description FROM products_product
+    """,
+    """
+    CREATE TRIGGER products_search_insert AFTER INSERT ON products_product BEGIN
+        INSERT INTO products_search (product_id, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER products_search_update AFTER UPDATE OF title, description ON products_product BEGIN
+        UPDATE products_search SET title = new.title, description = new.description
+        WHERE product_id = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER products_search_delete AFTER DELETE ON products_product BEGIN
+        DELETE FROM products_search WHERE product_id = old.id;
+    END
+    """,
+]
+SQLITE_REVERSE = [
+    'DROP TRIGGER IF EXISTS products_search_insert',
+    'DROP TRIGGER IF EXISTS products_search_update',
+    'DROP TRIGGER IF EXISTS products_search_delete',
+    'DROP TABLE IF EXISTS products_search',
+]
+
+
+def _run(schema_editor, statements):
+    with schema_editor.connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_FORWARD)
+    elif vendor == 'sqlite':
+        _run(schema_editor, SQLITE_FORWARD)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_REVERSE)
+    elif vendor == 'sqlite':
+        _run(schema_editor, SQLITE_REVERSE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_category_product_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
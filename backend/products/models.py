@@ -1,5 +1,5 @@
 import uuid
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 
 
@@ -9,6 +9,7 @@ class Category(models.Model):
     slug = models.SlugField(unique=True)
     icon = models.CharField(max_length=50, null=True, blank=True)
     description = models.TextField(null=True, blank=True)
+    product_count = models.IntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -58,12 +59,39 @@ class Product(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['-created_at', '-id'],
+                condition=models.Q(is_active=True),
+                name='product_active_created_idx'
+            ),
+            models.Index(fields=['owner', 'is_active', 'is_available'], name='product_owner_status_idx'),
+            models.Index(
+                fields=['-created_at', '-id'],
+                condition=models.Q(is_active=True, is_available=True),
+                name='product_listed_created_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        # Category counters are adjusted in post_save and must commit with the row
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    @property
+    def is_listed(self):
+        """Whether the product counts towards its category's product_count"""
+        return self.is_active and self.is_available and self.category_id is not None
+
     @property
     def primary_image(self):
+        if 'images' in getattr(self, '_prefetched_objects_cache', {}):
+            images = list(self.images.all())
+            candidates = [image for image in images if image.is_primary] or images
+            return min(candidates, key=lambda image: image.pk) if candidates else None
         return self.images.filter(is_primary=True).first() or self.images.first()
 
     def get_condition_value(self):
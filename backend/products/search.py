@@ -0,0 +1,74 @@
+"""
+Full-text product search.
+
+Postgres keeps a weighted tsvector as a generated column on the product
+table, indexed with GIN. SQLite (local development) keeps an FTS5 table
+that triggers fill from the product table. Both are created by migration
+0005_product_search and maintained by the database itself, so bulk writes
+and queryset updates stay in sync too. Words are indexed unstemmed so that
+every query word can match as a prefix. Any other database, or a query with
+no searchable words, falls back to icontains.
+"""
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+SEARCH_TABLE = 'products_search'
+TITLE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+_WORD = re.compile(r'\w+')
+_available = {}
+
+
+def search_terms(query):
+    return _WORD.findall(query.lower())
+
+
+def has_search_index(alias):
+    if alias not in _available:
+        connection = connections[alias]
+        if connection.vendor == 'postgresql':
+            _available[alias] = True
+        elif connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                _available[alias] = SEARCH_TABLE in connection.introspection.table_names(cursor)
+        else:
+            _available[alias] = False
+    return _available[alias]
+
+
+def icontains_search(queryset, query):
+    return queryset.filter(Q(title__icontains=query) | Q(description__icontains=query))
+
+
+def search_products(queryset, query):
+    """
+    Filter a product queryset to matches for `query`, every word matched as a
+    prefix, annotated with `search_rank` (higher is more relevant) and ordered
+    by it.
+    """
+    terms = search_terms(query)
+    if not terms or not has_search_index(queryset.db):
+        return icontains_search(queryset, query)
+
+    table = queryset.model._meta.db_table
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        queryset = queryset.filter(RawSQL(
+            f"{table}.search_vector @@ to_tsquery('simple', %s)", [tsquery], output_field=BooleanField()
+        )).annotate(search_rank=RawSQL(
+            f"ts_rank_cd({table}.search_vector, to_tsquery('simple', %s))", [tsquery], output_field=FloatField()
+        ))
+    else:
+        match = ' '.join(f'"{term}"*' for term in terms)
+        queryset = queryset.extra(
+            tables=[SEARCH_TABLE],
+            where=[f'{SEARCH_TABLE}.product_id = {table}.id', f'{SEARCH_TABLE} MATCH %s'],
+            params=[match],
+            select={'search_rank': f'-bm25({SEARCH_TABLE}, 0, {TITLE_WEIGHT}, {DESCRIPTION_WEIGHT})'}
+        )
+    return queryset.order_by('-search_rank', '-created_at')
@@ -11,14 +11,10 @@ class ProductImageSerializer(serializers.ModelSerializer):
 
 
 class CategorySerializer(serializers.ModelSerializer):
-    product_count = serializers.SerializerMethodField()
-
     class Meta:
         model = Category
         fields = ['id', 'name', 'slug', 'icon', 'description', 'product_count', 'created_at']
-
-    def get_product_count(self, obj):
-        return obj.products.filter(is_active=True, is_available=True).count()
+        read_only_fields = ['product_count']
 
 
 class ProductListSerializer(serializers.ModelSerializer):
@@ -0,0 +1,47 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Category, Product
+
+COUNTED_FIELDS = {'category', 'category_id', 'is_active', 'is_available'}
+
+
+def adjust_product_count(category_id, delta):
+    if category_id is not None and delta:
+        Category.objects.filter(pk=category_id).update(product_count=F('product_count') + delta)
+
+
+@receiver(pre_save, sender=Product)
+def remember_listing(sender, instance, update_fields=None, raw=False, **kwargs):
+    """Remember which category, if any, counted the product before this save"""
+    instance._previous_listing = None
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and not COUNTED_FIELDS & set(update_fields):
+        instance._previous_listing = False
+        return
+    previous = Product.objects.filter(pk=instance.pk).values_list(
+        'category_id', 'is_active', 'is_available'
+    ).first()
+    if previous is not None:
+        category_id, is_active, is_available = previous
+        instance._previous_listing = category_id if is_active and is_available else None
+
+
+@receiver(post_save, sender=Product)
+def update_category_counts(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_listing', None)
+    if raw or previous is False:
+        return
+    current = instance.category_id if instance.is_listed else None
+    if previous == current:
+        return
+    adjust_product_count(previous, -1)
+    adjust_product_count(current, 1)
+
+
+@receiver(post_delete, sender=Product)
+def release_category_count(sender, instance, **kwargs):
+    if instance.is_listed:
+        adjust_product_count(instance.category_id, -1)
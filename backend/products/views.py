@@ -1,8 +1,10 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
-from django.db.models import Q
+from backend.pagination import CreatedAtCursorPagination
 from .models import Category, ProductImage, Product
+from .search import search_products
 from .serializers import (
     CategorySerializer, ProductImageSerializer,
     ProductListSerializer, ProductDetailSerializer, ProductCreateSerializer
@@ -30,6 +32,16 @@ class ProductViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     lookup_field = 'id'
 
+    @property
+    def paginator(self):
+        # Search results are ordered by relevance, which has no stable cursor
+        if not hasattr(self, '_paginator'):
+            if self.request.query_params.get('search'):
+                self._paginator = PageNumberPagination()
+            else:
+                self._paginator = CreatedAtCursorPagination()
+        return self._paginator
+
     def get_serializer_class(self):
         if self.action == 'list':
             return ProductListSerializer
@@ -64,9 +76,7 @@ class ProductViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(estimated_value__lte=max_value)
         
         if search:
-            queryset = queryset.filter(
-                Q(title__icontains=search) | Q(description__icontains=search)
-            )
+            queryset = search_products(queryset, search)
         
         if owner:
             queryset = queryset.filter(owner_id=owner)
@@ -74,7 +84,7 @@ class ProductViewSet(viewsets.ModelViewSet):
         if available is not None:
             queryset = queryset.filter(is_available=available.lower() == 'true')
         
-        return queryset.prefetch_related('images', 'owner', 'category')
+        return queryset.select_related('owner', 'category').prefetch_related('images', 'owner__badges')
 
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -98,6 +108,8 @@ class ProductViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'], url_path='my_products')
     def my_products(self, request):
-        products = Product.objects.filter(owner=request.user, is_active=True)
+        products = Product.objects.filter(owner=request.user, is_active=True).select_related(
+            'owner', 'category'
+        ).prefetch_related('images', 'owner__badges')
         serializer = ProductListSerializer(products, many=True, context={'request': request})
         return Response(serializer.data)
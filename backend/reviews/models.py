@@ -15,6 +15,10 @@ class Review(models.Model):
     class Meta:
         ordering = ['-created_at']
         unique_together = ['reviewer', 'swap_request']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='review_created_idx'),
+            models.Index(fields=['reviewed_user', '-created_at', '-id'], name='review_user_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.reviewer.email} -> {self.reviewed_user.email}: {self.rating} stars"
@@ -1,15 +1,19 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Avg
+from django.db import transaction
+from backend.pagination import CreatedAtCursorPagination
 from .models import Review
 from .serializers import ReviewSerializer, ReviewCreateSerializer
-from accounts.models import Notification, TrustBadge
+from accounts.badges import record_event
+from accounts.notifications import notify
+from accounts.trust import record_review
 
 
 class ReviewViewSet(viewsets.ModelViewSet):
     serializer_class = ReviewSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
 
     def get_queryset(self):
         user_id = self.kwargs.get('user_pk')
@@ -23,25 +27,33 @@ class ReviewViewSet(viewsets.ModelViewSet):
         return ReviewSerializer
 
     def perform_create(self, serializer):
-        review = serializer.save(reviewer=self.request.user)
-        reviewed_user = review.reviewed_user
-        
-        reviews = Review.objects.filter(reviewed_user=reviewed_user)
-        avg_rating = reviews.aggregate(Avg('rating'))['rating__avg'] or 0
-        
-        reviewed_user.trust_score = min(10.0, max(0.0, float(avg_rating)))
-        reviewed_user.save()
-        
-        Notification.objects.create(
-            user=reviewed_user,
-            type='review',
-            title='New Review',
-            message=f'{self.request.user.email} left you a {review.rating}-star review!'
-        )
-        
-        total_reviews = reviews.count()
-        if total_reviews >= 10:
-            TrustBadge.objects.get_or_create(user=reviewed_user, badge_type='reviewer')
+        with transaction.atomic():
+            review = serializer.save(reviewer=self.request.user)
+            record_review(review.reviewed_user_id, review.rating)
+            notify(
+                user=review.reviewed_user_id,
+                type='review',
+                title='New Review',
+                message=f'{self.request.user.email} left you a {review.rating}-star review!',
+                key=f'review_created:{review.pk}'
+            )
+            record_event('review_created', [review.reviewed_user_id], key=f'review_created:{review.pk}')
+
+    def perform_update(self, serializer):
+        previous = serializer.instance
+        previous_user_id, previous_rating = previous.reviewed_user_id, previous.rating
+        with transaction.atomic():
+            review = serializer.save()
+            if review.reviewed_user_id != previous_user_id:
+                record_review(previous_user_id, -previous_rating, -1)
+                record_review(review.reviewed_user_id, review.rating)
+            elif review.rating != previous_rating:
+                record_review(review.reviewed_user_id, review.rating - previous_rating, 0)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            record_review(instance.reviewed_user_id, -instance.rating, -1)
+            instance.delete()
 
     @action(detail=False, methods=['get'], url_path='user/(?P<user_pk>[^/.]+)')
     def user_reviews(self, request, user_pk=None):
@@ -34,9 +34,11 @@ INSTALLED_APPS = [
     'bids',
     'matching',
     'messaging',
+    'jobs',
 ]
 
 MIDDLEWARE = [
+    'backend.instrumentation.RequestProfilingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -44,6 +46,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.notifications.NotificationBatchMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -67,6 +70,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'backend.wsgi.application'
+ASGI_APPLICATION = 'backend.asgi.application'
 
 if os.getenv('DATABASE_URL'):
     import dj_database_url
@@ -81,6 +85,27 @@ else:
         }
     }
 
+# A shared cache is needed for cross-process caches and the messaging event stream
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [os.getenv('REDIS_URL')]},
+        }
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        }
+    }
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -126,6 +151,43 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
+REQUEST_PROFILING = {
+    'ENABLED': os.getenv('REQUEST_PROFILING', 'False') == 'True',
+    'SAMPLE_RATE': float(os.getenv('REQUEST_PROFILING_SAMPLE_RATE', 1.0)),
+    'SERVER_TIMING': True,
+    'N_PLUS_ONE_THRESHOLD': 5,
+}
+
+MATCHING_SNAPSHOT = {
+    'TTL': int(os.getenv('MATCHING_SNAPSHOT_TTL', 300)),
+    'PATCH_VERSIONS': 50,
+}
+
+NOTIFICATIONS = {
+    'COALESCE_WINDOW': 60,
+}
+
+# Serverless functions may be frozen once they respond, so worker threads
+# are not an option on Vercel; jobs are queued in the database there and
+# run by the cron job in vercel.json. 'immediate' is only used when set.
+TASKS = {
+    'BACKEND': os.getenv('TASKS_BACKEND', 'database' if os.getenv('VERCEL') else 'thread'),
+    'WORKERS': int(os.getenv('TASKS_WORKERS', 1)),
+    'MAX_ATTEMPTS': 3,
+    'RETRY_DELAY': 5,
+    'LEASE': 300,
+    'KEY_TTL': 86400,
+    'CRON_SECRET': os.getenv('CRON_SECRET', ''),
+    'CRON_DURATION': 20,
+}
+
+MESSAGING_EVENTS = {
+    'TTL': int(os.getenv('MESSAGING_EVENTS_TTL', 300)),
+    'MAX_BATCH': 100,
+    'LONG_POLL_TIMEOUT': 25,
+    'POLL_INTERVAL': 1.0,
+}
+
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
 
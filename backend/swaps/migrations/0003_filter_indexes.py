@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-17 15:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('swaps', '0002_created_cursor_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='swaprequest',
+            index=models.Index(fields=['sender', 'status'], name='swap_sender_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='swaprequest',
+            index=models.Index(fields=['receiver', 'status'], name='swap_receiver_status_idx'),
+        ),
+    ]
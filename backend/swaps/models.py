@@ -25,6 +25,12 @@ class SwapRequest(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['sender', '-created_at', '-id'], name='swap_sender_created_idx'),
+            models.Index(fields=['receiver', '-created_at', '-id'], name='swap_receiver_created_idx'),
+            models.Index(fields=['sender', 'status'], name='swap_sender_status_idx'),
+            models.Index(fields=['receiver', 'status'], name='swap_receiver_status_idx'),
+        ]
 
     def __str__(self):
         return f"{self.sender.email} -> {self.receiver.email}: {self.sender_product.title} <-> {self.receiver_product.title}"
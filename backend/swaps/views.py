@@ -1,18 +1,31 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from backend.pagination import CreatedAtCursorPagination
 from .models import SwapRequest, CounterOffer
 from .serializers import (
     SwapRequestSerializer, SwapRequestCreateSerializer,
     CounterOfferSerializer, CounterOfferCreateSerializer
 )
-from accounts.models import Notification
+from accounts.badges import record_event
+from accounts.models import User
+from accounts.notifications import notify
+from accounts.trust import trust_score_expression
+from jobs.queue import enqueue
+from matching.signals import owner_changed
+from matching.snapshot import record_change
+from messaging.views import create_conversation_for_swap
+from products.models import Product
+from products.signals import adjust_product_count
 
 
 class SwapRequestViewSet(viewsets.ModelViewSet):
     serializer_class = SwapRequestSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
 
     def get_queryset(self):
         return SwapRequest.objects.filter(
@@ -26,11 +39,12 @@ class SwapRequestViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         swap = serializer.save(sender=self.request.user)
-        Notification.objects.create(
+        notify(
             user=swap.receiver,
             type='swap_request',
             title='New Swap Request',
-            message=f'{self.request.user.email} wants to swap with you!'
+            message=f'{self.request.user.email} wants to swap with you!',
+            key=f'swap_request:{swap.pk}'
         )
 
     @action(detail=True, methods=['post'])
@@ -42,39 +56,21 @@ class SwapRequestViewSet(viewsets.ModelViewSet):
         if swap.status != 'pending':
             return Response({'error': f'Cannot accept swap with status: {swap.status}'}, status=status.HTTP_400_BAD_REQUEST)
         
-        swap.status = 'accepted'
-        swap.save()
-        
-        from messaging.models import Conversation
-        
-        try:
-            conversation = Conversation.objects.create()
-            conversation.participants.add(swap.sender, swap.receiver)
-            if swap:
-                conversation.swap_request = swap
-                conversation.save()
-        except Exception as e:
-            print(f"Error creating conversation: {e}")
-            conversation = None
-            try:
-                convs = Conversation.objects.filter(participants=swap.sender).filter(participants=swap.receiver)
-                if convs.exists():
-                    conversation = convs.first()
-            except Exception:
-                pass
-        
-        Notification.objects.create(
-            user=swap.sender,
-            type='swap_accepted',
-            title='Swap Accepted',
-            message=f'{request.user.email} accepted your swap request! You can now message each other.'
-        )
-        
-        conversation_id = str(conversation.id) if conversation else None
+        with transaction.atomic():
+            swap.status = 'accepted'
+            swap.save()
+            conversation = create_conversation_for_swap(swap)
+            notify(
+                user=swap.sender,
+                type='swap_accepted',
+                title='Swap Accepted',
+                message=f'{request.user.email} accepted your swap request! You can now message each other.',
+                key=f'swap_accepted:{swap.pk}'
+            )
         
         return Response({
             'swap': SwapRequestSerializer(swap).data,
-            'conversation_id': conversation_id
+            'conversation_id': str(conversation.id)
         })
 
     @action(detail=True, methods=['post'])
@@ -86,11 +82,12 @@ class SwapRequestViewSet(viewsets.ModelViewSet):
         swap.status = 'rejected'
         swap.save()
         
-        Notification.objects.create(
+        notify(
             user=swap.sender,
             type='swap_rejected',
             title='Swap Rejected',
-            message=f'{request.user.email} rejected your swap request.'
+            message=f'{request.user.email} rejected your swap request.',
+            key=f'swap_rejected:{swap.pk}'
         )
         
         return Response(SwapRequestSerializer(swap).data)
@@ -110,84 +107,14 @@ class SwapRequestViewSet(viewsets.ModelViewSet):
         swap = self.get_object()
         if swap.sender != request.user and swap.receiver != request.user:
             return Response({'error': 'Not authorized'}, status=status.HTTP_403_FORBIDDEN)
-        
-        swap.status = 'completed'
-        swap.save()
-        
-        sender = swap.sender
-        receiver = swap.receiver
-        
-        sender.total_swaps += 1
-        receiver.total_swaps += 1
-        
-        sender.trust_score = min(10.00, float(sender.trust_score) + 0.25)
-        receiver.trust_score = min(10.00, float(receiver.trust_score) + 0.25)
-        
-        sender.save()
-        receiver.save()
-        
-        swap.sender_product.is_available = False
-        swap.receiver_product.is_available = False
-        swap.sender_product.save()
-        swap.receiver_product.save()
-        
-        from accounts.models import TrustBadge
-        
-        badge_earned = []
-        
-        badges_to_check = [
-            (1, 'quick_swapper', 'Quick Swapper'),
-            (5, 'trusted', 'Trusted'),
-            (10, 'top_trader', 'Top Trader'),
-            (25, 'top_trader', 'Elite Trader'),
-            (50, 'top_trader', 'Master Trader'),
-        ]
-        
-        for swap_count, badge_type, badge_name in badges_to_check:
-            if sender.total_swaps >= swap_count:
-                badge, created = TrustBadge.objects.get_or_create(
-                    user=sender,
-                    badge_type=badge_type,
-                    defaults={}
-                )
-                if created:
-                    badge_earned.append(badge_name)
-                    Notification.objects.create(
-                        user=sender,
-                        type='badge',
-                        title='Badge Earned!',
-                        message=f'You earned the {badge_name} badge!'
-                    )
-        
-        for swap_count, badge_type, badge_name in badges_to_check:
-            if receiver.total_swaps >= swap_count:
-                badge, created = TrustBadge.objects.get_or_create(
-                    user=receiver,
-                    badge_type=badge_type,
-                    defaults={}
-                )
-                if created:
-                    badge_earned.append(badge_name)
-                    Notification.objects.create(
-                        user=receiver,
-                        type='badge',
-                        title='Badge Earned!',
-                        message=f'You earned the {badge_name} badge!'
-                    )
-        
-        Notification.objects.create(
-            user=sender,
-            type='swap_completed',
-            title='Swap Completed',
-            message=f'Your swap with {receiver.email} is complete! Trust score increased.'
-        )
-        Notification.objects.create(
-            user=receiver,
-            type='swap_completed',
-            title='Swap Completed',
-            message=f'Your swap with {sender.email} is complete! Trust score increased.'
-        )
-        
+
+        if not complete_swap(swap):
+            swap.refresh_from_db(fields=['status'])
+            return Response(
+                {'error': f'Cannot complete swap with status: {swap.status}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
         return Response(SwapRequestSerializer(swap).data)
 
     @action(detail=True, methods=['post'], url_path='counter')
@@ -210,3 +137,62 @@ class SwapRequestViewSet(viewsets.ModelViewSet):
         swap = self.get_object()
         counters = swap.counter_offers.all()
         return Response(CounterOfferSerializer(counters, many=True).data)
+
+
+def complete_swap(swap):
+    """
+    Complete an accepted swap as one unit of work: the status change, both
+    users' counters and the products commit together or not at all.
+    Returns False, changing nothing, if the swap was no longer accepted, e.g.
+    because a concurrent request completed it first.
+    """
+    user_ids = [swap.sender_id, swap.receiver_id]
+    now = timezone.now()
+    with transaction.atomic():
+        claimed = SwapRequest.objects.filter(pk=swap.pk, status='accepted').update(
+            status='completed', updated_at=now
+        )
+        if not claimed:
+            return False
+
+        User.objects.filter(pk__in=user_ids).update(
+            total_swaps=F('total_swaps') + 1,
+            trust_score=trust_score_expression(total_swaps=F('total_swaps') + 1)
+        )
+        totals = {
+            user_id: (total_swaps, trust_score)
+            for user_id, total_swaps, trust_score in User.objects.filter(pk__in=user_ids).values_list(
+                'id', 'total_swaps', 'trust_score'
+            )
+        }
+
+        products = [swap.sender_product, swap.receiver_product]
+        listed = Product.objects.select_for_update().filter(
+            pk__in=[product.pk for product in products],
+            is_active=True, is_available=True, category__isnull=False
+        ).values_list('category_id', flat=True)
+        for category_id in listed:
+            adjust_product_count(category_id, -1)
+        for product in products:
+            product.is_available = False
+            product.updated_at = now
+        Product.objects.bulk_update(products, ['is_available', 'updated_at'])
+
+        record_event('swap_completed', user_ids, key=f'swap_completed:{swap.pk}')
+        notify(swap.sender_id, 'swap_completed', 'Swap Completed',
+               f'Your swap with {swap.receiver.email} is complete! Trust score increased.',
+               key=f'swap_completed:{swap.pk}')
+        notify(swap.receiver_id, 'swap_completed', 'Swap Completed',
+               f'Your swap with {swap.sender.email} is complete! Trust score increased.',
+               key=f'swap_completed:{swap.pk}')
+
+        # Queryset updates send no signals, so matching is refreshed explicitly
+        record_change(owner_ids=user_ids)
+        for user_id in user_ids:
+            enqueue(owner_changed, str(user_id))
+
+    swap.status = 'completed'
+    swap.updated_at = now
+    for user in (swap.sender, swap.receiver):
+        user.total_swaps, user.trust_score = totals[user.id]
+    return True
@@ -13,6 +13,7 @@ urlpatterns = [
     path('api/bids/', include('bids.urls')),
     path('api/matching/', include('matching.urls')),
     path('api/messages/', include('messaging.urls')),
+    path('api/jobs/', include('jobs.urls')),
     path('media/<path:path>', serve, {'document_root': settings.MEDIA_ROOT}),
 ]
 
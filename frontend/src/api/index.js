@@ -110,7 +110,7 @@ export const matchingAPI = {
 
 export const messagingAPI = {
   listConversations: () => api.get('/messages/'),
-  getMessages: (conversationId) => api.get(`/messages/${conversationId}/messages/`),
+  getMessages: (conversationId, params) => api.get(`/messages/${conversationId}/messages/`, { params }),
   sendMessage: (conversationId, data) => api.post(`/messages/${conversationId}/send/`, data),
   getUnreadCount: () => api.get('/messages/unread-count/'),
   starConversation: (conversationId) => api.post(`/messages/${conversationId}/star/`),
@@ -14,6 +14,9 @@ export default function MessagesPage() {
   const [newMessage, setNewMessage] = useState('');
   const [showMenu, setShowMenu] = useState(null);
   const messagesEndRef = useRef(null);
+  // id of the newest message fetched, the cursor for polling with ?since=
+  const lastSeenRef = useRef(null);
+  const openedRef = useRef(null);
 
   useEffect(() => {
     loadConversations();
@@ -30,7 +33,7 @@ export default function MessagesPage() {
     if (activeConversation) {
       loadMessages(activeConversation);
       const interval = setInterval(() => {
-        loadMessages(activeConversation);
+        pollMessages(activeConversation);
       }, 2000);
       return () => clearInterval(interval);
     }
@@ -68,10 +71,14 @@ export default function MessagesPage() {
   };
 
   const loadMessages = (conversationId) => {
+    openedRef.current = conversationId;
+    lastSeenRef.current = null;
     messagingAPI.getMessages(conversationId)
       .then((res) => {
+        if (openedRef.current !== conversationId) return;
+        const newMessages = res.data || [];
+        lastSeenRef.current = newMessages.length ? newMessages[newMessages.length - 1].id : null;
         setMessages(prev => {
-          const newMessages = res.data || [];
           if (prev.length === 0 || JSON.stringify(prev) !== JSON.stringify(newMessages)) {
             return newMessages;
           }
@@ -85,6 +92,25 @@ export default function MessagesPage() {
     setActiveConversation(conversationId);
   };
 
+  const pollMessages = (conversationId) => {
+    const since = lastSeenRef.current;
+    messagingAPI.getMessages(conversationId, since ? { since } : undefined)
+      .then((res) => {
+        const fresh = res.data || [];
+        if (openedRef.current !== conversationId || fresh.length === 0) return;
+        lastSeenRef.current = fresh[fresh.length - 1].id;
+        setMessages(prev => {
+          const known = new Set(prev.map(m => m.id));
+          const added = fresh.filter(m => !known.has(m.id));
+          return added.length ? [...prev, ...added] : prev;
+        });
+        loadConversations();
+      })
+      .catch((err) => {
+        console.error('Error loading messages:', err);
+      });
+  };
+
   const sendMessage = (content) => {
     if (!activeConversation || !content.trim()) return;
     messagingAPI.sendMessage(activeConversation, { content })